@@ -0,0 +1,10 @@
+ALTER TABLE goals ADD COLUMN IF NOT EXISTS total_books INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE goals ADD COLUMN IF NOT EXISTS done_books INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE goals DISABLE TRIGGER trg_goals_touch;
+UPDATE goals g
+SET total_books = p.total_books,
+    done_books = p.done_books
+FROM goal_progress p
+WHERE p.goal_id = g.id;
+ALTER TABLE goals ENABLE TRIGGER trg_goals_touch;
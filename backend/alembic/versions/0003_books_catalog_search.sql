@@ -0,0 +1,6 @@
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+-- Trigram indexes work on CJK text as long as the database uses a UTF-8
+-- locale; they back the word-similarity lookups of the local catalog.
+CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books USING gin (author gin_trgm_ops);
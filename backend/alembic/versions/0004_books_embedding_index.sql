@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS idx_books_embedding_hnsw
+  ON books USING hnsw (embedding vector_cosine_ops);
@@ -0,0 +1,11 @@
+-- Progress counters change whenever a book is attached or its status toggles;
+-- that is not an edit of the goal, so only other columns bump updated_at.
+CREATE OR REPLACE FUNCTION touch_goals_updated_at() RETURNS trigger AS $$
+BEGIN
+  IF (to_jsonb(NEW) - 'total_books' - 'done_books' - 'updated_at')
+     IS DISTINCT FROM (to_jsonb(OLD) - 'total_books' - 'done_books' - 'updated_at') THEN
+    NEW.updated_at = now();
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,3 @@
+-- Which embedder produced books.embedding. Rows from another model (or from
+-- before this column existed) are re-embedded by app.jobs.embed_books.
+ALTER TABLE books ADD COLUMN IF NOT EXISTS embedding_model TEXT;
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import redis.asyncio as aioredis
+
+from .config import get_settings
+from .redis_client import redis
+from .singleflight import SingleFlight
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", q).casefold().split())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    redis_hits: int = 0
+    refreshes: int = 0
+    fallbacks: int = 0
+
+
+class LRU:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SearchCache:
+    # Entries are fresh for `ttl` seconds, then served stale for up to
+    # `stale_ttl` more while a single background task refreshes them.
+
+    def __init__(self, name: str, ttl: int, stale_ttl: int, maxsize: int | None = None) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LRU(maxsize or settings.cache_lru_size)
+        self.stats = CacheStats()
+        self.flight = SingleFlight(name)
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def _load(self, key: str) -> tuple[float, Any] | None:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        return await self._load_remote(key)
+
+    async def _load_remote(self, key: str) -> tuple[float, Any] | None:
+        if not redis:
+            return None
+        try:
+            cached = await redis.get(self._redis_key(key))
+        except aioredis.RedisError:
+            logger.warning("redis read failed for %s", self.name, exc_info=True)
+            return None
+        if not cached:
+            return None
+        payload = json.loads(cached)
+        entry = (payload["f"], payload["v"])
+        self.local.set(key, entry)
+        self.stats.redis_hits += 1
+        return entry
+
+    async def _store(self, key: str, value: Any) -> None:
+        fresh_until = time.time() + self.ttl
+        self.local.set(key, (fresh_until, value))
+        if not redis:
+            return
+        try:
+            await redis.set(
+                self._redis_key(key),
+                json.dumps({"f": fresh_until, "v": value}, ensure_ascii=False),
+                ex=self.ttl + self.stale_ttl,
+            )
+        except aioredis.RedisError:
+            logger.warning("redis write failed for %s", self.name, exc_info=True)
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._store(key, await fetch())
+            self.stats.refreshes += 1
+        except Exception:
+            logger.warning("background refresh failed for %s:%s", self.name, key, exc_info=True)
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = await self._load(key)
+        expired = None
+        if entry is not None:
+            fresh_until, value = entry
+            now = time.time()
+            if now < fresh_until:
+                self.stats.hits += 1
+                return value
+            if now < fresh_until + self.stale_ttl:
+                self.stats.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+                return value
+            expired = value
+            self.local.pop(key)
+        self.stats.misses += 1
+        try:
+            return await self.flight.do(key, lambda: self._fetch_and_store(key, fetch), lambda: self._lookup(key))
+        except Exception:
+            # Upstream failed or its circuit is open: an expired entry still
+            # beats an error.
+            if expired is None:
+                raise
+            logger.warning("serving expired %s:%s after fetch failure", self.name, key, exc_info=True)
+            self.stats.fallbacks += 1
+            return expired
+
+    async def refresh_if_expiring(self, key: str, fetch: Callable[[], Awaitable[Any]], margin: float) -> bool:
+        # Another worker may have refreshed the shared entry, so Redis is
+        # authoritative here rather than this worker's LRU.
+        entry = await self._load_remote(key) if redis else self.local.get(key)
+        if entry is not None and entry[0] - time.time() > margin:
+            return False
+        await self.flight.do(key, lambda: self._fetch_and_store(key, fetch), lambda: self._lookup(key))
+        self.stats.refreshes += 1
+        return True
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        await self._store(key, value)
+        return value
+
+    async def _lookup(self, key: str) -> Any | None:
+        entry = await self._load_remote(key)
+        return entry[1] if entry is not None else None
+
+
+_caches: dict[str, SearchCache] = {}
+
+
+def register_cache(cache: SearchCache) -> SearchCache:
+    _caches[cache.name] = cache
+    return cache
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {
+        name: {**asdict(cache.stats), "size": len(cache.local), "coalesced": cache.flight.coalesced}
+        for name, cache in _caches.items()
+    }
@@ -1,17 +1,82 @@
 from functools import lru_cache
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     database_url: str
+    database_read_url: str | None = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 60 * 30
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+    db_prepared_statement_cache_size: int = 100
     redis_url: str | None = None
     calil_appkey: str | None = None
     default_city: str = "宮崎市"
     ndl_api_base: str = "https://iss.ndl.go.jp/api/opensearch"
     cinii_base: str = "https://ci.nii.ac.jp/books/opensearch/search"
+    calil_base: str = "https://api.calil.jp"
+    # Comma-separated prefectures to index; empty indexes all of Japan.
+    calil_prefectures: str = ""
+    calil_library_refresh: int = 60 * 60 * 24
+    # JSON registry of per-system OPAC link templates; defaults to app/data.
+    opac_links_path: str | None = None
+    ndl_deadline: float = 6.0
+    cinii_deadline: float = 4.0
+    local_catalog_min_results: int = 12
+    embedding_model: str | None = None
+    embedding_batch_size: int = 256
+    semantic_max_distance: float = 0.8
+    recommend_cache_ttl: int = 60 * 60
+    recommend_cache_stale_ttl: int = 60 * 60 * 6
+    recommend_refresh_interval: int = 60 * 5
+    recommend_refresh_top_n: int = 100
+    http_timeout: float = 20.0
+    http_connect_timeout: float = 5.0
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_keepalive_expiry: float = 30.0
+    http2: bool = True
+    cache_lru_size: int = 1024
+    ndl_cache_ttl: int = 60 * 60 * 6
+    cinii_cache_ttl: int = 60 * 60 * 6
+    search_cache_stale_ttl: int = 60 * 60 * 24
+    singleflight_lock_ttl: float = 25.0
+    calil_max_isbns: int = 100
+    # Requests per second per upstream, shared across workers through Redis.
+    ndl_rate_limit: float = 5.0
+    cinii_rate_limit: float = 5.0
+    calil_rate_limit: float = 2.0
+    rate_limit_burst: float = 5.0
+    rate_limit_max_wait: float = 2.0
+    breaker_window: float = 30.0
+    breaker_min_calls: int = 10
+    breaker_failure_ratio: float = 0.5
+    breaker_slow_call: float = 8.0
+    breaker_open_seconds: float = 30.0
+    # Share of requests traced when no sampled traceparent header is sent.
+    trace_sample_rate: float = 0.01
+    trace_buffer_size: int = 200
+    trace_max_spans: int = 512
+    trace_debug_endpoint: bool = False
+    otlp_endpoint: str | None = None
+    otlp_service_name: str = "libremore-api"
+    otlp_export_interval: float = 5.0
     jwt_secret: str
     jwt_algorithm: str = "HS256"
     allowed_origins: str = "http://localhost:3000"
+    # "cache" serves users from a short-lived LRU/Redis cache; "claims" also
+    # trusts signed token claims for auth_claims_ttl seconds after issue.
+    auth_mode: Literal["db", "cache", "claims"] = "db"
+    auth_claims_ttl: int = 300
+    auth_user_cache_ttl: int = 60
+    auth_user_cache_size: int = 4096
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", env_prefix="", extra="allow")
 
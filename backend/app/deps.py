@@ -1,23 +1,73 @@
-from collections.abc import AsyncGenerator
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncGenerator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Any
+from uuid import UUID
 
+import redis.asyncio as aioredis
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
+from .cache import LRU
 from .config import get_settings
+from .metrics import TimedQueuePool
 from .models import User
+from .redis_client import redis
+from .tracing import instrument_engine
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+
+def _build_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=False,
+        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={
+            # asyncpg's own per-connection cache, and SQLAlchemy's cache of
+            # prepared statements on top of it. Set both to 0 behind pgbouncer
+            # in transaction mode.
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+        },
+    )
+
+
+engine = _build_engine(settings.database_url)
+# Read-only endpoints use the replica when one is configured; it may lag the
+# primary, so nothing that reads its own writes should go through it.
+read_engine = _build_engine(settings.database_read_url) if settings.database_read_url else engine
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
 SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(bind=read_engine, expire_on_commit=False)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+)
+
+_user_cache = LRU(settings.auth_user_cache_size)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -25,26 +75,122 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal() as session:
+        yield session
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(hours=12))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(hours=12))
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+@dataclass
+class HashingStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+# bcrypt is CPU-bound and releases the GIL, so it runs on a dedicated thread
+# pool instead of the event loop. The semaphore caps concurrent hashes and
+# lets us measure how long logins queue for a slot.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_hash_slots = asyncio.Semaphore(settings.password_hash_workers)
+hashing_stats = HashingStats()
+
+
+async def _run_hashing(fn: Callable[..., Any], *args: Any) -> Any:
+    enqueued = time.perf_counter()
+    hashing_stats.queued += 1
+    async with _hash_slots:
+        hashing_stats.queued -= 1
+        waited = time.perf_counter() - enqueued
+        hashing_stats.wait_seconds_total += waited
+        hashing_stats.wait_seconds_max = max(hashing_stats.wait_seconds_max, waited)
+        hashing_stats.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+        finally:
+            hashing_stats.running -= 1
+            hashing_stats.completed += 1
+
+
+def password_hashing_stats() -> dict:
+    return asdict(hashing_stats)
+
 
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # Returns a replacement hash when the stored one uses outdated parameters.
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
+async def get_password_hash(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    session: Annotated[AsyncSession, Depends(get_db)],
-) -> User:
+
+def user_claims(user: User) -> dict:
+    return {"sub": str(user.id), "email": user.email, "created_at": user.created_at.isoformat()}
+
+
+def _user_from_claims(claims: dict) -> User:
+    return User(id=UUID(claims["sub"]), email=claims["email"], created_at=datetime.fromisoformat(claims["created_at"]))
+
+
+async def _cached_user(user_id: str) -> User | None:
+    entry = _user_cache.get(user_id)
+    if entry is not None and entry[0] > time.time():
+        return _user_from_claims(entry[1])
+    if redis:
+        try:
+            cached = await redis.get(f"user:{user_id}")
+        except aioredis.RedisError:
+            logger.warning("redis read failed for user cache", exc_info=True)
+            return None
+        if cached:
+            claims = json.loads(cached)
+            _user_cache.set(user_id, (time.time() + settings.auth_user_cache_ttl, claims))
+            return _user_from_claims(claims)
+    return None
+
+
+async def _remember_user(user: User) -> None:
+    claims = user_claims(user)
+    _user_cache.set(claims["sub"], (time.time() + settings.auth_user_cache_ttl, claims))
+    if redis:
+        try:
+            await redis.set(f"user:{claims['sub']}", json.dumps(claims), ex=settings.auth_user_cache_ttl)
+        except aioredis.RedisError:
+            logger.warning("redis write failed for user cache", exc_info=True)
+
+
+async def invalidate_user(user_id: UUID | str) -> None:
+    _user_cache.pop(str(user_id))
+    if redis:
+        try:
+            await redis.delete(f"user:{user_id}")
+        except aioredis.RedisError:
+            # Other workers keep serving the entry until auth_user_cache_ttl.
+            logger.warning("redis delete failed for user %s", user_id, exc_info=True)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: User) -> None:
+    _user_cache.pop(str(target.id))
+    if redis:
+        try:
+            asyncio.get_running_loop().create_task(redis.delete(f"user:{target.id}"))
+        except RuntimeError:
+            pass
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -57,7 +203,24 @@ async def get_current_user(
             raise credentials_exception
     except JWTError as exc:
         raise credentials_exception from exc
-    user = await session.get(User, user_id)
+
+    if settings.auth_mode == "claims" and "email" in payload and "created_at" in payload:
+        issued_at = payload.get("iat", 0)
+        if time.time() - issued_at <= settings.auth_claims_ttl:
+            return _user_from_claims(payload)
+    if settings.auth_mode in ("claims", "cache"):
+        user = await _cached_user(user_id)
+        if user is not None:
+            return user
+
+    async with ReadSessionLocal() as session:
+        user = await session.get(User, user_id)
+    if user is None and read_engine is not engine:
+        # Just registered and not yet replicated.
+        async with SessionLocal() as session:
+            user = await session.get(User, user_id)
     if user is None:
         raise credentials_exception
+    if settings.auth_mode in ("claims", "cache"):
+        await _remember_user(user)
     return user
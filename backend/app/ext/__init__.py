@@ -1 +1 @@
-__all__ = ["calil", "ndl", "cinii", "opac_link"]
+__all__ = ["calil", "calil_libraries", "ndl", "cinii", "http", "opac_link", "opensearch", "resilience"]
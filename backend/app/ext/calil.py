@@ -1,72 +1,314 @@
 import asyncio
 import hashlib
 import json
-import os
+import logging
 import random
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 import redis.asyncio as aioredis
 
 from ..config import get_settings
+from ..metrics import AVAILABILITY_CACHE, CALIL_POLL_ROUNDS
+from ..redis_client import redis
+from ..singleflight import SingleFlight
+from ..tracing import span
+from .calil_libraries import get_library_index
+from .http import get_client
+from .opac_link import Links, build_links
+from .resilience import UpstreamUnavailable, guarded
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 CALIL_APPKEY = settings.calil_appkey
-CALIL_BASE = "https://api.calil.jp"
+CALIL_BASE = settings.calil_base
+AVAILABILITY_TTL = 60 * 15
 
-redis = aioredis.from_url(settings.redis_url) if settings.redis_url else None
+availability_flight = SingleFlight("avail")
+# Queues of every caller waiting on an in-flight batch, by flight key, so
+# partial rows reach coalesced callers and not just the one that started it.
+_listeners: Dict[str, List[asyncio.Queue]] = {}
+
+# Branch states reported in libkey, most useful first.
+BRANCH_STATES = ("貸出可", "蔵書あり", "館内のみ", "貸出中", "予約中", "準備中", "休館中")
+_STATE_RANK = {state: rank for rank, state in enumerate(BRANCH_STATES)}
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class Availability:
+    # One (isbn, system) result. Rows are cached in Redis as the compact
+    # [status, reserveurl, [[branch, state], ...]] array and rendered to JSON
+    # once, without building an intermediate dict. OPAC links are attached per
+    # system in batches by attach_links before rendering.
+
+    __slots__ = ("isbn13", "systemid", "calil_status", "reserve_url", "libkey", "links", "_json")
+
+    def __init__(
+        self,
+        isbn13: str,
+        systemid: str,
+        calil_status: str,
+        reserve_url: Optional[str],
+        libkey: Tuple[Tuple[str, str], ...],
+    ) -> None:
+        self.isbn13 = isbn13
+        self.systemid = systemid
+        self.calil_status = calil_status
+        self.reserve_url = reserve_url
+        self.libkey = libkey
+        self.links: Optional[Links] = None
+        self._json: Optional[str] = None
+
+    @classmethod
+    def from_calil(cls, isbn13: str, systemid: str, state: Dict) -> "Availability":
+        libkey = state.get("libkey") or {}
+        return cls(
+            isbn13,
+            systemid,
+            state.get("status") or "Running",
+            state.get("reserveurl") or None,
+            tuple(libkey.items()),
+        )
+
+    @classmethod
+    def unavailable(cls, isbn13: str, systemid: str) -> "Availability":
+        # Stand-in for a pair Calil could not be asked about (circuit open,
+        # rate limited, upstream error); rendered as 照会失敗 and never cached.
+        return cls(isbn13, systemid, "Error", None, ())
+
+    @classmethod
+    def from_cache(cls, isbn13: str, systemid: str, raw: str) -> "Availability":
+        calil_status, reserve_url, libkey = json.loads(raw)
+        return cls(isbn13, systemid, calil_status, reserve_url, tuple(map(tuple, libkey)))
+
+    @property
+    def cacheable(self) -> bool:
+        return self.calil_status in ("OK", "Cache")
+
+    @property
+    def status(self) -> str:
+        if not self.cacheable:
+            return "照会失敗"
+        if not self.libkey:
+            return "蔵書なし"
+        return min((state for _, state in self.libkey), key=lambda state: _STATE_RANK.get(state, len(_STATE_RANK)))
+
+    def to_cache(self) -> str:
+        return _encode([self.calil_status, self.reserve_url, self.libkey])
+
+    def to_json(self) -> str:
+        if self._json is None:
+            if self.links is None:
+                attach_links([self])
+            links = self.links
+            libkey = ",".join(f"{_encode(branch)}:{_encode(state)}" for branch, state in self.libkey)
+            branch_urls = ",".join(f"{_encode(branch)}:{_encode(url)}" for branch, url in links.branch_urls)
+            self._json = (
+                f'{{"isbn13":{_encode(self.isbn13)},"systemid":{_encode(self.systemid)},'
+                f'"status":{_encode(self.status)},"calilStatus":{_encode(self.calil_status)},'
+                f'"libkey":{{{libkey}}},"branchUrls":{{{branch_urls}}},'
+                f'"reserveUrl":{_encode(links.reserve_url)},"opacUrl":{_encode(links.opac_url)}}}'
+            )
+        return self._json
 
 
 async def get_systemids_for_city(city: str) -> List[str]:
-    cache_key = f"sysids:{city}"
-    if redis:
-        cached = await redis.get(cache_key)
-        if cached:
-            return json.loads(cached)
-    systemids = ["MiyazakiSys-001", "MiyazakiSys-002"]
-    if redis:
-        await redis.set(cache_key, json.dumps(systemids), ex=60 * 60 * 24 * 30)
-    return systemids
-
-
-async def check_availability(isbns: List[str], city: str) -> List[Dict]:
-    digest = hashlib.sha1((",".join(sorted(isbns)) + city).encode()).hexdigest()
-    cache_key = f"avail:{digest}"
-    if redis:
-        cached = await redis.get(cache_key)
-        if cached:
-            return json.loads(cached)
+    index = await get_library_index()
+    return index.systemids(city)
 
-    systemids = await get_systemids_for_city(city)
+
+def attach_links(rows: List[Availability]) -> List[Availability]:
+    by_system: Dict[str, List[Availability]] = {}
+    for row in rows:
+        if row.links is None:
+            by_system.setdefault(row.systemid, []).append(row)
+    for systemid, group in by_system.items():
+        links = build_links(systemid, ((row.isbn13, row.reserve_url, [b for b, _ in row.libkey]) for row in group))
+        for row, link in zip(group, links):
+            row.links = link
+    return rows
+
+
+def _row_key(isbn: str, systemid: str) -> str:
+    return f"avail:{systemid}:{isbn}"
+
+
+async def _cached_rows(isbns: List[str], systemids: List[str]) -> Dict[Tuple[str, str], Availability]:
+    if not redis or not isbns:
+        return {}
+    pairs = [(isbn, systemid) for isbn in isbns for systemid in systemids]
+    try:
+        values = await redis.mget([_row_key(isbn, systemid) for isbn, systemid in pairs])
+    except aioredis.RedisError:
+        logger.warning("redis read failed for availability rows", exc_info=True)
+        return {}
+    return {pair: Availability.from_cache(*pair, value) for pair, value in zip(pairs, values) if value}
+
+
+async def _store_rows(rows: List[Availability]) -> None:
+    rows = [row for row in rows if row.cacheable]
+    if not redis or not rows:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for row in rows:
+        pipe.set(_row_key(row.isbn13, row.systemid), row.to_cache(), ex=AVAILABILITY_TTL)
+    try:
+        await pipe.execute()
+    except aioredis.RedisError:
+        logger.warning("redis write failed for %d availability rows", len(rows), exc_info=True)
+
+
+def _settled_rows(
+    data: Dict, isbns: List[str], systemids: List[str], pending: set, final: bool
+) -> List[Availability]:
+    books = data.get("books") or {}
+    rows: List[Availability] = []
+    for isbn in isbns:
+        for systemid in systemids:
+            if (isbn, systemid) not in pending:
+                continue
+            state = (books.get(isbn) or {}).get(systemid) or {}
+            if not final and state.get("status", "Running") == "Running":
+                continue
+            pending.discard((isbn, systemid))
+            rows.append(Availability.from_calil(isbn, systemid, state))
+    return rows
+
+
+async def _poll_batch(isbns: List[str], systemids: List[str], key: Optional[str] = None) -> List[Availability]:
     params = {
         "appkey": CALIL_APPKEY,
         "isbn": ",".join(isbns),
         "systemid": ",".join(systemids),
         "format": "json",
+        # Without callback=no, /check answers JSONP.
+        "callback": "no",
     }
-    async with httpx.AsyncClient(timeout=20.0) as client:
+    pending = {(isbn, systemid) for isbn in isbns for systemid in systemids}
+    results: List[Availability] = []
+    client = get_client("calil")
+    async with guarded("calil"):
         resp = await client.get(f"{CALIL_BASE}/check", params=params)
         resp.raise_for_status()
-        data = resp.json()
-        session = data.get("session")
+    data = resp.json()
+    session = data.get("session")
+    rounds = 1
+    while True:
         cont = data.get("continue", 0)
-        while cont == 1:
+        rows = _settled_rows(data, isbns, systemids, pending, final=cont != 1)
+        if rows:
+            await _store_rows(rows)
+            results.extend(rows)
+            for queue in _listeners.get(key, ()):
+                queue.put_nowait(("rows", rows))
+        if cont != 1:
+            CALIL_POLL_ROUNDS.observe(rounds)
+            return results
+        rounds += 1
+        with span("calil.poll", round=rounds, pending=len(pending)):
             await asyncio.sleep(0.8 + random.random() * 0.6)
-            poll = await client.get(
-                f"{CALIL_BASE}/check",
-                params={"appkey": CALIL_APPKEY, "session": session, "format": "json"},
-            )
-            poll.raise_for_status()
+            async with guarded("calil"):
+                poll = await client.get(
+                    f"{CALIL_BASE}/check",
+                    params={"appkey": CALIL_APPKEY, "session": session, "format": "json", "callback": "no"},
+                )
+                poll.raise_for_status()
             data = poll.json()
-            cont = data.get("continue", 0)
 
-    # Placeholder transformation for MVP
-    results: List[Dict] = []
-    for systemid in systemids:
-        for isbn in isbns:
-            results.append({"isbn13": isbn, "systemid": systemid, "status": "在架"})
 
-    if redis:
-        await redis.set(cache_key, json.dumps(results), ex=60 * 15)
-    return results
+async def _cached_batch(isbns: List[str], systemids: List[str]) -> Optional[List[Availability]]:
+    cached = await _cached_rows(isbns, systemids)
+    if len(cached) < len(isbns) * len(systemids):
+        return None
+    return list(cached.values())
+
+
+async def _check_batch(isbns: List[str], systemids: List[str], queue: asyncio.Queue) -> None:
+    key = hashlib.sha1((",".join(sorted(isbns)) + "|" + ",".join(sorted(systemids))).encode()).hexdigest()
+    listeners = _listeners.setdefault(key, [])
+    listeners.append(queue)
+    try:
+        rows = await availability_flight.do(
+            key,
+            lambda: _poll_batch(isbns, systemids, key),
+            lambda: _cached_batch(isbns, systemids),
+        )
+    except (httpx.HTTPError, UpstreamUnavailable) as exc:
+        # Degrade to per-row failures so cached and already polled rows are
+        # still returned; rows already sent for this batch are skipped later.
+        logger.warning("calil check failed for %d isbns: %r", len(isbns), exc)
+        rows = [Availability.unavailable(isbn, systemid) for isbn in isbns for systemid in systemids]
+        await queue.put(("done", rows))
+    except Exception as exc:
+        await queue.put(("error", exc))
+    else:
+        await queue.put(("done", rows))
+    finally:
+        listeners.remove(queue)
+        if not listeners:
+            _listeners.pop(key, None)
+
+
+async def iter_availability(isbns: List[str], city: str) -> AsyncIterator[List[Availability]]:
+    systemids = await get_systemids_for_city(city)
+    async for rows in _iter_rows(list(dict.fromkeys(isbns)), systemids):
+        yield rows
+
+
+def _missing_batches(
+    isbns: List[str], systemids: List[str], cached: Dict[Tuple[str, str], Availability]
+) -> List[Tuple[List[str], List[str]]]:
+    # Calil checks every ISBN of a request against every system, so ISBNs are
+    # grouped by the exact systems they still miss and only those are asked.
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for isbn in isbns:
+        missing = tuple(systemid for systemid in systemids if (isbn, systemid) not in cached)
+        if missing:
+            groups.setdefault(missing, []).append(isbn)
+    size = settings.calil_max_isbns
+    return [
+        (group[i : i + size], list(missing))
+        for missing, group in groups.items()
+        for i in range(0, len(group), size)
+    ]
+
+
+async def _iter_rows(isbns: List[str], systemids: List[str]) -> AsyncIterator[List[Availability]]:
+    cached = await _cached_rows(isbns, systemids)
+    AVAILABILITY_CACHE.labels("hit").inc(len(cached))
+    AVAILABILITY_CACHE.labels("miss").inc(len(isbns) * len(systemids) - len(cached))
+    if cached:
+        yield attach_links(list(cached.values()))
+
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks = [
+        asyncio.create_task(_check_batch(batch, missing, queue))
+        for batch, missing in _missing_batches(isbns, systemids, cached)
+    ]
+    seen = set(cached)
+    remaining = len(tasks)
+    try:
+        while remaining:
+            kind, payload = await queue.get()
+            if kind == "error":
+                raise payload
+            if kind == "done":
+                remaining -= 1
+            fresh = [row for row in payload if (row.isbn13, row.systemid) not in seen]
+            if fresh:
+                seen.update((row.isbn13, row.systemid) for row in fresh)
+                yield attach_links(fresh)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def check_availability(isbns: List[str], city: str) -> List[Availability]:
+    isbns = list(dict.fromkeys(isbns))
+    systemids = await get_systemids_for_city(city)
+    rows: Dict[Tuple[str, str], Availability] = {}
+    async for chunk in _iter_rows(isbns, systemids):
+        for row in chunk:
+            rows[(row.isbn13, row.systemid)] = row
+    return [rows[(isbn, systemid)] for systemid in systemids for isbn in isbns if (isbn, systemid) in rows]
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from ..config import get_settings
+from ..redis_client import redis
+from ..singleflight import SingleFlight
+from .http import get_client
+from .resilience import guarded
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "calil:libraries"
+# Shipped index used until the first Calil fetch completes, so a cold start
+# never blocks availability checks on the full /library crawl.
+BUNDLED_SNAPSHOT = Path(__file__).resolve().parent.parent / "data" / "calil_libraries.json"
+# A snapshot missing some prefectures is retried sooner than a complete one.
+FAILED_RETRY_AFTER = 60 * 10
+PREFECTURES = (
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+)
+
+index_flight = SingleFlight("libindex", lock_ttl=300)
+
+
+class LibrarySystem(NamedTuple):
+    systemid: str
+    name: str
+    pref: str
+    url: str
+
+
+def normalize_place(name: str) -> str:
+    return "".join(unicodedata.normalize("NFKC", name).split())
+
+
+class AmbiguousPlaceError(ValueError):
+    def __init__(self, place: str, prefectures: List[str]) -> None:
+        super().__init__(f"{place} exists in several prefectures: {', '.join(prefectures)}")
+        self.place = place
+        self.prefectures = prefectures
+
+
+class LibraryIndex:
+    # Built from compact [systemid, systemname, pref, city, url_pc] rows, one
+    # per library. Cities are keyed with their prefecture ("宮崎県宮崎市"), and
+    # bare ("宮崎市") only when no other prefecture has a city of that name; a
+    # prefecture key covers all its systems.
+
+    __slots__ = ("systems", "places", "ambiguous", "fetched_at")
+
+    def __init__(self, rows: Iterable[List[str]], fetched_at: float) -> None:
+        self.systems: Dict[str, LibrarySystem] = {}
+        places: Dict[str, Dict[str, None]] = {}
+        cities: Dict[str, Dict[str, Dict[str, None]]] = {}
+        for systemid, name, pref, city, url in rows:
+            # System ids repeat across libraries and every availability row.
+            systemid = sys.intern(systemid)
+            if systemid not in self.systems:
+                self.systems[systemid] = LibrarySystem(systemid, name, pref, url)
+            for key in (pref, pref + city):
+                if key:
+                    places.setdefault(normalize_place(key), {})[systemid] = None
+            if city:
+                cities.setdefault(normalize_place(city), {}).setdefault(pref, {})[systemid] = None
+        self.ambiguous: Dict[str, List[str]] = {}
+        for city, by_pref in cities.items():
+            if len(by_pref) == 1:
+                places.setdefault(city, {}).update(next(iter(by_pref.values())))
+            else:
+                self.ambiguous[city] = sorted(by_pref)
+        self.places: Dict[str, Tuple[str, ...]] = {key: tuple(ids) for key, ids in places.items()}
+        self.fetched_at = fetched_at
+
+    def systemids(self, place: str) -> List[str]:
+        key = normalize_place(place)
+        if key in self.ambiguous:
+            raise AmbiguousPlaceError(place, self.ambiguous[key])
+        return list(self.places.get(key, ()))
+
+    def system(self, systemid: str) -> Optional[LibrarySystem]:
+        return self.systems.get(systemid)
+
+
+def _load_bundled() -> Optional[LibraryIndex]:
+    if not BUNDLED_SNAPSHOT.exists():
+        return None
+    snapshot = json.loads(BUNDLED_SNAPSHOT.read_text(encoding="utf-8"))
+    # fetched_at 0 keeps it stale, so the first refresh replaces it.
+    return LibraryIndex(snapshot["rows"], 0)
+
+
+_index: Optional[LibraryIndex] = _load_bundled()
+
+
+def current_library_index() -> Optional[LibraryIndex]:
+    return _index
+
+
+async def _fetch_prefecture(pref: str) -> List[List[str]]:
+    params = {"appkey": settings.calil_appkey, "pref": pref, "format": "json", "callback": ""}
+    async with guarded("calil"):
+        resp = await get_client("calil").get(f"{settings.calil_base}/library", params=params)
+        resp.raise_for_status()
+    return [
+        [lib["systemid"], lib.get("systemname", ""), lib.get("pref", pref), lib.get("city", ""), lib.get("url_pc", "")]
+        for lib in resp.json()
+        if lib.get("systemid")
+    ]
+
+
+async def _fetch_snapshot(previous: Optional[Dict]) -> Dict:
+    # A prefecture that fails keeps its rows from the previous snapshot and is
+    # recorded so the next refresh comes sooner; only a total failure raises.
+    prefectures = [p.strip() for p in settings.calil_prefectures.split(",") if p.strip()] or PREFECTURES
+    previous_rows: Dict[str, List[List[str]]] = {}
+    for row in (previous or {}).get("rows", []):
+        previous_rows.setdefault(row[2], []).append(row)
+    rows: List[List[str]] = []
+    failed: List[str] = []
+    for pref in prefectures:
+        try:
+            rows.extend(await _fetch_prefecture(pref))
+        except Exception:
+            logger.warning("library listing for %s failed", pref, exc_info=True)
+            failed.append(pref)
+            rows.extend(previous_rows.get(pref, []))
+    if len(failed) == len(prefectures):
+        raise RuntimeError("library listing failed for every prefecture")
+    snapshot = {"fetched": time.time(), "rows": rows, "failed": failed}
+    if redis:
+        try:
+            await redis.set(SNAPSHOT_KEY, json.dumps(snapshot, ensure_ascii=False))
+        except aioredis.RedisError:
+            logger.warning("could not store library index snapshot", exc_info=True)
+    return snapshot
+
+
+async def _load_snapshot() -> Optional[Dict]:
+    if not redis:
+        return None
+    try:
+        cached = await redis.get(SNAPSHOT_KEY)
+    except aioredis.RedisError:
+        logger.warning("could not read library index snapshot", exc_info=True)
+        return None
+    return json.loads(cached) if cached else None
+
+
+def _is_fresh(fetched_at: float, partial: bool = False) -> bool:
+    max_age = FAILED_RETRY_AFTER if partial else settings.calil_library_refresh
+    return time.time() - fetched_at < max_age
+
+
+def _snapshot_is_fresh(snapshot: Dict) -> bool:
+    return _is_fresh(snapshot["fetched"], bool(snapshot.get("failed")))
+
+
+async def refresh_library_index(force: bool = False) -> LibraryIndex:
+    global _index
+    # The in-memory index does not know whether it is partial, so it is
+    # rechecked against the shared snapshot at the shorter interval.
+    if _index is not None and not force and _is_fresh(_index.fetched_at, partial=True):
+        return _index
+    snapshot = await _load_snapshot()
+    if force or snapshot is None or not _snapshot_is_fresh(snapshot):
+        previous = snapshot
+        snapshot = await index_flight.do("all", lambda: _fetch_snapshot(previous), _load_snapshot)
+    if _index is None or snapshot["fetched"] > _index.fetched_at:
+        _index = LibraryIndex(snapshot["rows"], snapshot["fetched"])
+        logger.info("library index loaded: %d systems, %d places", len(_index.systems), len(_index.places))
+    return _index
+
+
+async def get_library_index() -> LibraryIndex:
+    # Only blocks when no bundled snapshot was shipped; otherwise the
+    # background loop swaps in the full index once it is built.
+    return _index or await refresh_library_index()
+
+
+async def library_index_loop() -> None:
+    while True:
+        try:
+            await refresh_library_index()
+        except Exception:
+            logger.warning("library index refresh failed", exc_info=True)
+            await asyncio.sleep(60)
+            continue
+        await asyncio.sleep(settings.calil_library_refresh / 24)
@@ -1,49 +1,25 @@
-import re
 from typing import Dict, List
 from urllib.parse import urlencode
 
-import feedparser
-import httpx
-
+from ..cache import SearchCache, normalize_query, register_cache
 from ..config import get_settings
+from .http import get_client
+from .opensearch import parse_opensearch_stream
+from .resilience import guarded
 
 settings = get_settings()
 
-
-def _normalize_isbn(value: str) -> str | None:
-    digits = re.sub(r"[^0-9Xx]", "", value)
-    return digits if len(digits) in (10, 13) else None
+cinii_cache = register_cache(SearchCache("cinii", settings.cinii_cache_ttl, settings.search_cache_stale_ttl))
 
 
 async def search_cinii_by_title(q: str, limit: int = 20) -> List[Dict]:
+    q = normalize_query(q)
+    return await cinii_cache.get_or_fetch(f"{q}:{limit}", lambda: _fetch_cinii(q, limit))
+
+
+async def _fetch_cinii(q: str, limit: int) -> List[Dict]:
     params = {"title": q, "count": limit, "format": "rss"}
     url = f"{settings.cinii_base}?{urlencode(params)}"
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(url)
+    async with guarded("cinii"), get_client("cinii").stream("GET", url) as resp:
         resp.raise_for_status()
-        feed = feedparser.parse(resp.text)
-    items = []
-    for entry in feed.entries:
-        title = entry.get("title")
-        author = entry.get("author")
-        summary = entry.get("summary", "")
-        match = re.search(r"ISBN[:\s]*([0-9Xx\-]+)", summary)
-        isbn13 = None
-        if match:
-            candidate = _normalize_isbn(match.group(1))
-            if candidate and len(candidate) == 13:
-                isbn13 = candidate
-        if not isbn13:
-            continue
-        items.append(
-            {
-                "isbn13": isbn13,
-                "title": title,
-                "author": author,
-                "publisher": None,
-                "pubyear": None,
-                "ndc": None,
-                "ndlc": None,
-            }
-        )
-    return items
+        return await parse_opensearch_stream(resp.aiter_bytes(), limit)
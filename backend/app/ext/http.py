@@ -0,0 +1,45 @@
+import importlib.util
+from typing import Dict
+
+import httpx
+
+from ..config import get_settings
+
+settings = get_settings()
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+UPSTREAMS = ("ndl", "cinii", "calil")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        http2=settings.http2 and HTTP2_AVAILABLE,
+    )
+
+
+def get_client(upstream: str) -> httpx.AsyncClient:
+    # One pooled client per upstream host so connection limits apply per host.
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = _build_client()
+    return client
+
+
+def open_clients() -> None:
+    for upstream in UPSTREAMS:
+        get_client(upstream)
+
+
+async def close_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -1,64 +1,25 @@
-import asyncio
-import re
 from typing import Dict, List
 from urllib.parse import urlencode
 
-import feedparser
-import httpx
-
+from ..cache import SearchCache, normalize_query, register_cache
 from ..config import get_settings
+from .http import get_client
+from .opensearch import parse_opensearch_stream
+from .resilience import guarded
 
 settings = get_settings()
 
-
-def _to_isbn13(isbn: str) -> str | None:
-    if not isbn:
-        return None
-    digits = re.sub(r"[^0-9Xx]", "", isbn)
-    return digits if len(digits) in (10, 13) else None
+ndl_cache = register_cache(SearchCache("ndl", settings.ndl_cache_ttl, settings.search_cache_stale_ttl))
 
 
 async def search_ndl_by_query(q: str, limit: int = 20) -> List[Dict]:
+    q = normalize_query(q)
+    return await ndl_cache.get_or_fetch(f"{q}:{limit}", lambda: _fetch_ndl(q, limit))
+
+
+async def _fetch_ndl(q: str, limit: int) -> List[Dict]:
     params = {"q": q, "cnt": limit}
     url = f"{settings.ndl_api_base}?{urlencode(params)}"
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(url)
+    async with guarded("ndl"), get_client("ndl").stream("GET", url) as resp:
         resp.raise_for_status()
-        feed = feedparser.parse(resp.text)
-    items = []
-    for entry in feed.entries:
-        title = entry.get("title")
-        author = entry.get("author")
-        publisher = entry.get("publisher") or entry.get("dc_publisher")
-        date = entry.get("issued") or entry.get("published")
-        year = None
-        if date:
-            match = re.search(r"\d{4}", str(date))
-            year = int(match.group(0)) if match else None
-        isbns = []
-        for key, value in entry.items():
-            if "isbn" in key.lower():
-                if isinstance(value, list):
-                    isbns.extend(value)
-                else:
-                    isbns.append(value)
-        isbn13 = None
-        for raw in isbns:
-            candidate = _to_isbn13(str(raw))
-            if candidate and len(candidate) == 13:
-                isbn13 = candidate
-                break
-        if not isbn13:
-            continue
-        items.append(
-            {
-                "isbn13": isbn13,
-                "title": title,
-                "author": author,
-                "publisher": publisher,
-                "pubyear": year,
-                "ndc": None,
-                "ndlc": None,
-            }
-        )
-    return items
+        return await parse_opensearch_stream(resp.aiter_bytes(), limit)
@@ -1,19 +1,85 @@
-from typing import Optional
-
-OPAC_MAP = {
-    "MiyazakiSys-001": {
-        "name": "宮崎市立図書館",
-        "isbn_url": "https://opac.lib.miyazaki.example/search?func=search&isbn={isbn}",
-    },
-    "MiyazakiSys-002": {
-        "name": "宮崎市 〇〇分館",
-        "isbn_url": "https://opac.lib.miyazaki.example/branch2/search?isbn={isbn}",
-    },
-}
-
-
-def opac_isbn_url(systemid: str, isbn13: str) -> Optional[str]:
-    conf = OPAC_MAP.get(systemid)
-    if not conf:
-        return None
-    return conf["isbn_url"].format(isbn=isbn13)
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from ..config import get_settings
+from ..isbn import isbn13_to_10
+from .calil_libraries import current_library_index
+
+settings = get_settings()
+
+DEFAULT_REGISTRY = Path(__file__).resolve().parent.parent / "data" / "opac_links.json"
+TEMPLATE_FIELDS = frozenset(("isbn13", "isbn10", "systemid", "libkey"))
+_FIELD = re.compile(r"\{(\w+)\}")
+
+
+class Template:
+    # "{isbn13}"-style templates are compiled once into a %-format string and
+    # the ordered field names, so rendering is a single C-level format.
+
+    __slots__ = ("fmt", "fields", "needs_isbn10")
+
+    def __init__(self, template: str) -> None:
+        fields = _FIELD.findall(template)
+        unknown = set(fields) - TEMPLATE_FIELDS
+        if unknown:
+            raise ValueError(f"unknown OPAC template fields {sorted(unknown)} in {template!r}")
+        self.fmt = _FIELD.sub("%s", template.replace("%", "%%"))
+        self.fields = tuple(fields)
+        self.needs_isbn10 = "isbn10" in fields
+
+    def render(self, values: Dict[str, str]) -> str:
+        return self.fmt % tuple(values[field] for field in self.fields)
+
+
+class SystemLinks(NamedTuple):
+    isbn: Optional[Template]
+    libkey: Optional[Template]
+    reserve: Optional[Template]
+
+
+class Links(NamedTuple):
+    opac_url: Optional[str]
+    reserve_url: Optional[str]
+    branch_urls: Tuple[Tuple[str, str], ...]
+
+
+def load_registry(path: Path) -> Dict[str, SystemLinks]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    registry = {}
+    for systemid, conf in data.get("systems", {}).items():
+        registry[systemid] = SystemLinks(
+            *(Template(conf[kind]) if conf.get(kind) else None for kind in ("isbn", "libkey", "reserve"))
+        )
+    return registry
+
+
+REGISTRY = load_registry(Path(settings.opac_links_path) if settings.opac_links_path else DEFAULT_REGISTRY)
+_NO_LINKS = SystemLinks(None, None, None)
+
+
+def build_links(
+    systemid: str, books: Iterable[Tuple[str, Optional[str], Iterable[str]]]
+) -> List[Links]:
+    # Resolves every (isbn13, calil reserveurl, branches) of one system in a
+    # batch: the registry and library index are consulted once per system.
+    conf = REGISTRY.get(systemid, _NO_LINKS)
+    index = current_library_index()
+    system = index.system(systemid) if index else None
+    homepage = system.url if system and system.url else None
+    needs_isbn10 = any(t is not None and t.needs_isbn10 for t in conf)
+    links = []
+    for isbn13, reserve_url, branches in books:
+        values = {"isbn13": isbn13, "systemid": systemid}
+        if needs_isbn10:
+            values["isbn10"] = isbn13_to_10(isbn13) or ""
+        if not reserve_url and conf.reserve is not None:
+            reserve_url = conf.reserve.render(values)
+        opac_url = conf.isbn.render(values) if conf.isbn is not None else reserve_url or homepage
+        branch_urls: Tuple[Tuple[str, str], ...] = ()
+        if conf.libkey is not None:
+            branch_urls = tuple((branch, conf.libkey.render({**values, "libkey": quote(branch)})) for branch in branches)
+        links.append(Links(opac_url, reserve_url, branch_urls))
+    return links
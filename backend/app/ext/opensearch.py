@@ -0,0 +1,86 @@
+import re
+from typing import AsyncIterator, Dict, List, Optional
+from xml.etree.ElementTree import Element, XMLPullParser
+
+from ..isbn import find_isbn, normalize_isbn
+from ..tracing import traced
+
+XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+RDF_RESOURCE = "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource"
+ITEM_TAGS = frozenset(("item", "entry"))
+_YEAR = re.compile(r"\d{4}")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _text(elem: Element) -> Optional[str]:
+    text = (elem.text or "").strip()
+    return text or None
+
+
+def parse_item(item: Element) -> Optional[Dict]:
+    fields: Dict[str, Optional[str]] = {}
+    isbn13 = None
+    ndc = ndlc = None
+    description = None
+    for child in item:
+        name = _local(child.tag)
+        xsi_type = child.get(XSI_TYPE, "")
+        if name == "identifier":
+            if not isbn13 and xsi_type.endswith(":ISBN"):
+                isbn13 = normalize_isbn(_text(child))
+        elif name == "subject":
+            if xsi_type.startswith("dcndl:NDC") and not ndc:
+                ndc = _text(child)
+            elif xsi_type == "dcndl:NDLC" and not ndlc:
+                ndlc = _text(child)
+        elif name == "hasPart":
+            resource = child.get(RDF_RESOURCE, "")
+            if not isbn13 and resource.startswith("urn:isbn:"):
+                isbn13 = normalize_isbn(resource[9:])
+        elif name in ("description", "summary"):
+            description = _text(child)
+        elif name in ("title", "creator", "author", "publisher", "issued", "date"):
+            fields.setdefault(name, _text(child))
+    isbn13 = isbn13 or find_isbn(description)
+    if not isbn13:
+        return None
+    date = fields.get("issued") or fields.get("date")
+    match = _YEAR.search(date) if date else None
+    return {
+        "isbn13": isbn13,
+        "title": fields.get("title"),
+        "author": fields.get("creator") or fields.get("author"),
+        "publisher": fields.get("publisher"),
+        "pubyear": int(match.group(0)) if match else None,
+        "ndc": ndc,
+        "ndlc": ndlc,
+    }
+
+
+@traced("opensearch.parse")
+async def parse_opensearch_stream(chunks: AsyncIterator[bytes], limit: int) -> List[Dict]:
+    # Items are parsed as soon as their closing tag arrives and then cleared,
+    # so memory stays bounded and the download stops once `limit` books with
+    # an ISBN have been found. A malformed feed raises ParseError rather than
+    # returning a partial list, so the search cache never stores it.
+    parser = XMLPullParser(events=("end",))
+    items: List[Dict] = []
+    seen: set = set()
+    async for chunk in chunks:
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if _local(elem.tag) not in ITEM_TAGS:
+                continue
+            book = parse_item(elem)
+            elem.clear()
+            if book is None or book["isbn13"] in seen:
+                continue
+            seen.add(book["isbn13"])
+            items.append(book)
+            if len(items) >= limit:
+                return items
+    parser.close()
+    return items
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+import redis.asyncio as aioredis
+
+from ..config import get_settings
+from ..metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY
+from ..redis_client import redis
+from ..tracing import span
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailable):
+    pass
+
+
+# Refills the bucket, then reserves one token unless the caller would have to
+# wait longer than ARGV[4]. Returns the wait in seconds, or -1 when rejected.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+  wait = (1 - tokens) / rate
+end
+if wait > max_wait then
+  return '-1'
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._ts = time.monotonic()
+
+    def _reserve_local(self, max_wait: float) -> float:
+        now = time.monotonic()
+        tokens = min(self.burst, self._tokens + (now - self._ts) * self.rate)
+        wait = max(0.0, (1 - tokens) / self.rate)
+        if wait > max_wait:
+            return -1.0
+        self._tokens, self._ts = tokens - 1, now
+        return wait
+
+    async def _reserve(self, max_wait: float) -> float:
+        if not redis:
+            return self._reserve_local(max_wait)
+        try:
+            wait = await redis.eval(
+                _TOKEN_BUCKET_SCRIPT, 1, f"ratelimit:{self.name}", self.rate, self.burst, time.time(), max_wait
+            )
+            return float(wait)
+        except aioredis.RedisError:
+            logger.warning("shared rate limiter unavailable for %s", self.name, exc_info=True)
+            return self._reserve_local(max_wait)
+
+    async def acquire(self) -> None:
+        wait = await self._reserve(settings.rate_limit_max_wait)
+        if wait < 0:
+            raise RateLimitedError(f"{self.name} rate limit exceeded")
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    # Opens when, over the last `window` seconds and at least `min_calls`
+    # calls, the share of failed or slow calls reaches `failure_ratio`. After
+    # `open_seconds` a single trial call is let through (half-open).
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._trial_running = False
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - settings.breaker_window:
+            self._calls.popleft()
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < settings.breaker_open_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_running:
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self._trial_running = True
+
+    def abandon(self) -> None:
+        # The call never reached the upstream; free the half-open trial slot.
+        self._trial_running = False
+
+    def cancelled(self, elapsed: float) -> None:
+        # A caller deadline cut the call short. That says nothing about the
+        # upstream unless the call had already been slow, so a fast cancelled
+        # call is not recorded and a half-open trial is simply given back.
+        if elapsed >= settings.breaker_slow_call:
+            self.record(False, elapsed)
+        else:
+            self.abandon()
+
+    def record(self, ok: bool, elapsed: float) -> None:
+        now = time.monotonic()
+        ok = ok and elapsed < settings.breaker_slow_call
+        if self.state == "half_open":
+            self._trial_running = False
+            if ok:
+                self.state = "closed"
+                self._calls.clear()
+            else:
+                self._open(now)
+            return
+        self._calls.append((now, ok))
+        self._trim(now)
+        failures = sum(1 for _, success in self._calls if not success)
+        if len(self._calls) >= settings.breaker_min_calls and failures / len(self._calls) >= settings.breaker_failure_ratio:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        logger.warning("circuit for %s opened", self.name)
+        self.state = "open"
+        self.opened_at = now
+        self._calls.clear()
+
+    def snapshot(self) -> Dict:
+        self._trim(time.monotonic())
+        return {
+            "state": self.state,
+            "calls": len(self._calls),
+            "failures": sum(1 for _, ok in self._calls if not ok),
+        }
+
+
+limiters: Dict[str, TokenBucket] = {
+    "ndl": TokenBucket("ndl", settings.ndl_rate_limit, settings.rate_limit_burst),
+    "cinii": TokenBucket("cinii", settings.cinii_rate_limit, settings.rate_limit_burst),
+    "calil": TokenBucket("calil", settings.calil_rate_limit, settings.rate_limit_burst),
+}
+breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(name) for name in limiters}
+
+
+@asynccontextmanager
+async def guarded(upstream: str) -> AsyncIterator[None]:
+    with span("upstream", upstream=upstream):
+        breaker = breakers[upstream]
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            UPSTREAM_ERRORS.labels(upstream, "circuit_open").inc()
+            raise
+        # Waiting for or being refused a token is not an upstream outcome:
+        # only the call itself, below, is recorded on the breaker.
+        try:
+            await limiters[upstream].acquire()
+        except RateLimitedError:
+            breaker.abandon()
+            UPSTREAM_ERRORS.labels(upstream, "rate_limited").inc()
+            raise
+        except BaseException:
+            breaker.abandon()
+            raise
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            breaker.cancelled(time.monotonic() - start)
+            UPSTREAM_ERRORS.labels(upstream, "cancelled").inc()
+            raise
+        except Exception as exc:
+            # Transport errors, timeouts and unusable responses (e.g. a feed
+            # that fails to parse mid-stream) all count against the upstream.
+            breaker.record(False, time.monotonic() - start)
+            UPSTREAM_ERRORS.labels(upstream, type(exc).__name__).inc()
+            raise
+        except BaseException:
+            # Interpreter shutdown and the like: no verdict on the upstream.
+            breaker.abandon()
+            raise
+        else:
+            breaker.record(True, time.monotonic() - start)
+        finally:
+            UPSTREAM_LATENCY.labels(upstream).observe(time.monotonic() - start)
+
+
+def breaker_states() -> Dict[str, Dict]:
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import re
+from operator import mul
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+_SEPARATORS = re.compile(r"[\s\-‐-―−ー－]+")
+_ISBN_IN_TEXT = re.compile(r"(?:97[89][\s\-]?)?(?:\d[\s\-]?){9}[\dXx]")
+_FULLWIDTH = str.maketrans("０１２３４５６７８９Ｘｘ", "0123456789Xx")
+
+# Check digits are computed on the ASCII bytes directly; the weighted sum of
+# the b"0" offsets is subtracted once instead of converting every digit.
+_W10 = tuple(range(10, 1, -1))
+_W10_OFFSET = 48 * sum(_W10)
+_W13 = (1, 3) * 6
+_W13_OFFSET = 48 * sum(_W13)
+_W10_ARRAY = np.arange(10, 0, -1)
+_W13_ARRAY = np.array(_W13)
+# "978" contributes a fixed amount to the ISBN-13 sum of a converted ISBN-10.
+_978_SUM = 9 * 1 + 7 * 3 + 8 * 1
+# Below this many values numpy's per-call overhead outweighs the vector pass.
+_VECTOR_MIN = 40
+
+
+def _strip(value: str) -> str:
+    if not value.isascii():
+        value = value.translate(_FULLWIDTH)
+    return _SEPARATORS.sub("", value).upper()
+
+
+def isbn10_check_digit(body: str) -> str:
+    total = sum(map(mul, _W10, body.encode())) - _W10_OFFSET
+    check = (11 - total % 11) % 11
+    return "X" if check == 10 else chr(48 + check)
+
+
+def isbn13_check_digit(body: str) -> str:
+    total = sum(map(mul, _W13, body.encode())) - _W13_OFFSET
+    return chr(48 + (10 - total % 10) % 10)
+
+
+def is_valid_isbn10(value: str) -> bool:
+    return (
+        len(value) == 10
+        and value[:9].isdigit()
+        and value[:9].isascii()
+        and value[9] == isbn10_check_digit(value[:9])
+    )
+
+
+def is_valid_isbn13(value: str) -> bool:
+    return (
+        len(value) == 13
+        and value.isdigit()
+        and value.isascii()
+        and value.startswith(("978", "979"))
+        and value[12] == isbn13_check_digit(value[:12])
+    )
+
+
+def isbn10_to_13(isbn10: str) -> str:
+    body = "978" + isbn10[:9]
+    return body + isbn13_check_digit(body)
+
+
+def isbn13_to_10(isbn13: str) -> Optional[str]:
+    if not isbn13.startswith("978"):
+        return None
+    body = isbn13[3:12]
+    return body + isbn10_check_digit(body)
+
+
+def _clean(value: str) -> str:
+    # Plain and hyphenated ASCII input, including an ISBN-10 ending in X, skips
+    # the regex; anything else goes through _strip.
+    digits = value.replace("-", "")
+    if digits.isascii():
+        if digits.isdigit():
+            return digits
+        if len(digits) == 10 and digits[:9].isdigit():
+            return digits.upper()
+    return _strip(value)
+
+
+def normalize_isbn(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return _from_clean(_clean(value))
+
+
+def _from_clean(digits: str) -> Optional[str]:
+    if len(digits) == 13:
+        return digits if is_valid_isbn13(digits) else None
+    if len(digits) == 10 and is_valid_isbn10(digits):
+        return isbn10_to_13(digits)
+    return None
+
+
+def _digit_matrix(values: List[str], width: int) -> np.ndarray:
+    # One row of digit values per string; "X" becomes 10 (b":" - b"0").
+    raw = "".join(values).encode().replace(b"X", b":")
+    return (np.frombuffer(raw, dtype=np.uint8).reshape(-1, width) - 48).astype(np.int64)
+
+
+def _valid_isbn13s(values: List[str]) -> np.ndarray:
+    digits = _digit_matrix(values, 13)
+    ok = (digits <= 9).all(axis=1) & (digits[:, 0] == 9) & (digits[:, 1] == 7) & (digits[:, 2] >= 8)
+    return ok & ((digits[:, :12] @ _W13_ARRAY + digits[:, 12]) % 10 == 0)
+
+
+def _isbn10s_to_13(values: List[str]) -> List[Optional[str]]:
+    digits = _digit_matrix(values, 10)
+    ok = (digits[:, :9] <= 9).all(axis=1) & (digits[:, 9] <= 10) & ((digits @ _W10_ARRAY) % 11 == 0)
+    # ISBN-13 weights continue 3, 1, 3, ... after the "978" prefix.
+    checks = (10 - (_978_SUM + digits[:, :9] @ _W13_ARRAY[1:10]) % 10) % 10
+    return [f"978{value[:9]}{check}" if valid else None for value, valid, check in zip(values, ok, checks.tolist())]
+
+
+def normalize_isbns(values: Iterable[Optional[str]]) -> List[str]:
+    # Batch form of normalize_isbn: values are cleaned one by one, then every
+    # check digit of each length is verified in a single vectorised pass.
+    cleaned = [_clean(value) for value in values if value]
+    if len(cleaned) < _VECTOR_MIN:
+        return list(dict.fromkeys(isbn for isbn in map(_from_clean, cleaned) if isbn is not None))
+    isbn13s = [digits for digits in cleaned if len(digits) == 13 and digits.isascii()]
+    isbn10s = [digits for digits in cleaned if len(digits) == 10 and digits.isascii()]
+    normalized: dict[str, Optional[str]] = {}
+    if isbn13s:
+        normalized.update((digits, digits if ok else None) for digits, ok in zip(isbn13s, _valid_isbn13s(isbn13s)))
+    if isbn10s:
+        normalized.update(zip(isbn10s, _isbn10s_to_13(isbn10s)))
+    seen: dict[str, None] = {}
+    for digits in cleaned:
+        isbn = normalized.get(digits)
+        if isbn is not None:
+            seen.setdefault(isbn)
+    return list(seen)
+
+
+def find_isbn(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    for match in _ISBN_IN_TEXT.finditer(text):
+        isbn = normalize_isbn(match.group(0))
+        if isbn is not None:
+            return isbn
+    return None
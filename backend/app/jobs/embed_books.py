@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+from sqlalchemy import or_, select, update
+
+from ..config import get_settings
+from ..deps import SessionLocal, engine
+from ..models import Book
+from ..services.catalog import book_to_dict
+from ..services.embedding import book_text, get_embedder
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    embedder = get_embedder()
+    total = 0
+    async with SessionLocal() as session:
+        while True:
+            stmt = (
+                select(Book)
+                .where(or_(Book.embedding.is_(None), Book.embedding_model.is_distinct_from(embedder.name)))
+                .order_by(Book.id)
+                .limit(settings.embedding_batch_size)
+            )
+            books = list(await session.scalars(stmt))
+            if not books:
+                break
+            vectors = await asyncio.to_thread(embedder.embed, [book_text(book_to_dict(book)) for book in books])
+            await session.execute(
+                update(Book),
+                [
+                    {"id": book.id, "embedding": vector, "embedding_model": embedder.name}
+                    for book, vector in zip(books, vectors)
+                ],
+            )
+            await session.commit()
+            total += len(books)
+            logger.info("embedded %d books", total)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+import asyncio
+import logging
+
+from ..deps import SessionLocal, engine
+from ..services.goals import reconcile_goal_progress
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    async with SessionLocal() as session:
+        drifted = await reconcile_goal_progress(session)
+        await session.commit()
+    for goal_id in drifted:
+        logger.warning("goal %s progress counters drifted from goal_progress; repaired", goal_id)
+    logger.info("reconciled %d goals", len(drifted))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
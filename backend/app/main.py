@@ -1,14 +1,51 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache import cache_stats
 from .config import get_settings
-from .routers import auth, availability, goals, mypage, recommend
+from .deps import engine, password_hashing_stats, read_engine
+from .ext.calil_libraries import library_index_loop
+from .ext.http import close_clients, open_clients
+from .ext.resilience import breaker_states
+from .metrics import MetricsMiddleware, StatsCollector, register_collector, render_metrics
+from .routers import auth, availability, debug, goals, mypage, recommend
+from .services.recommendation_cache import refresh_popular_loop
+from .tracing import TracingMiddleware, export_loop
 
 settings = get_settings()
 
-app = FastAPI(title="LibreMore API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    open_clients()
+    background = [
+        asyncio.create_task(library_index_loop()),
+        asyncio.create_task(refresh_popular_loop()),
+        asyncio.create_task(export_loop()),
+    ]
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        for task in background:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await close_clients()
+
+
+app = FastAPI(title="LibreMore API", lifespan=lifespan)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+engines = {"primary": engine} if read_engine is engine else {"primary": engine, "read": read_engine}
+register_collector(StatsCollector(cache_stats, breaker_states, engines))
 
 origins = [origin.strip() for origin in settings.allowed_origins.split(",") if origin.strip()]
 app.add_middleware(
@@ -24,8 +61,21 @@ app.include_router(recommend.router)
 app.include_router(availability.router)
 app.include_router(goals.router)
 app.include_router(mypage.router)
+if settings.trace_debug_endpoint:
+    app.include_router(debug.router)
 
 
 @app.get("/health")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
+def health() -> dict:
+    return {
+        "status": "ok",
+        "caches": cache_stats(),
+        "upstreams": breaker_states(),
+        "password_hashing": password_hashing_stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
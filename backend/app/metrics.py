@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to external APIs",
+    ["upstream"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed or rejected calls to external APIs", ["upstream", "kind"])
+CALIL_POLL_ROUNDS = Histogram(
+    "calil_poll_rounds",
+    "Calil /check polling rounds per ISBN batch",
+    buckets=(1, 2, 3, 5, 8, 13, 21),
+)
+AVAILABILITY_CACHE = Counter("availability_cache_total", "Calil availability cache lookups per row", ["result"])
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):  # type: ignore[no-untyped-def]
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: labels requests by their route template once the
+    # router has matched, so path parameters do not explode cardinality.
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+class StatsCollector:
+    # Exposes counters the app already keeps (cache stats, breaker state, pool
+    # usage) at scrape time instead of updating metrics on the hot path.
+
+    def __init__(self, cache_stats: Callable[[], dict], breaker_states: Callable[[], dict], engines: dict) -> None:
+        self.cache_stats = cache_stats
+        self.breaker_states = breaker_states
+        self.engines = engines
+
+    def collect(self) -> Iterator[Metric]:
+        lookups = CounterMetricFamily("search_cache_lookups", "Search cache lookups by result", labels=["cache", "result"])
+        for name, stats in self.cache_stats().items():
+            for result in ("hits", "stale_hits", "misses", "redis_hits", "fallbacks", "coalesced"):
+                lookups.add_metric([name, result], stats[result])
+        yield lookups
+
+        breaker = GaugeMetricFamily("upstream_circuit_open", "1 when the upstream circuit is not closed", labels=["upstream"])
+        for name, state in self.breaker_states().items():
+            breaker.add_metric([name], float(state["state"] != "closed"))
+        yield breaker
+
+        in_use = GaugeMetricFamily("db_pool_checked_out", "Connections checked out of the pool", labels=["engine"])
+        for name, engine in self.engines.items():
+            in_use.add_metric([name], engine.pool.checkedout())
+        yield in_use
+
+
+_collectors: list[StatsCollector] = []
+
+
+def register_collector(collector: StatsCollector) -> None:
+    _collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Aggregated counters come from the shared files; the scrape-time
+        # stats describe the worker that answers the scrape.
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        for collector in _collectors:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -4,7 +4,8 @@ from datetime import date, datetime
 from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Integer, String, UniqueConstraint
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Integer, String, UniqueConstraint, column, table
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -39,6 +40,8 @@ class Goal(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     archived: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     due_date: Mapped[Optional[date]] = mapped_column(Date)
+    total_books: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    done_books: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     user: Mapped[User] = relationship("User", back_populates="goals")
     goal_books: Mapped[list[GoalBook]] = relationship(
@@ -60,6 +63,8 @@ class Book(Base):
     pubyear: Mapped[Optional[int]] = mapped_column(Integer)
     ndc: Mapped[Optional[str]] = mapped_column(String)
     ndlc: Mapped[Optional[str]] = mapped_column(String)
+    embedding: Mapped[Optional[list[float]]] = mapped_column(Vector(768), deferred=True)
+    embedding_model: Mapped[Optional[str]] = mapped_column(String)
 
     goal_books: Mapped[list[GoalBook]] = relationship("GoalBook", back_populates="book")
 
@@ -76,3 +81,11 @@ class GoalBook(Base):
 
     goal: Mapped[Goal] = relationship("Goal", back_populates="goal_books")
     book: Mapped[Book] = relationship("Book", back_populates="goal_books")
+
+
+goal_progress = table(
+    "goal_progress",
+    column("goal_id", UUID(as_uuid=True)),
+    column("total_books", Integer),
+    column("done_books", Integer),
+)
@@ -0,0 +1,7 @@
+import redis.asyncio as aioredis
+
+from .config import get_settings
+
+settings = get_settings()
+
+redis = aioredis.from_url(settings.redis_url) if settings.redis_url else None
@@ -6,7 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
-from ..deps import create_access_token, get_current_user, get_db, get_password_hash, verify_password
+from ..deps import create_access_token, get_current_user, get_db, get_password_hash, user_claims, verify_password
 from ..models import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -17,7 +17,7 @@ async def register(payload: schemas.UserCreate, session: AsyncSession = Depends(
     existing = await session.execute(select(User).where(User.email == payload.email))
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    user = User(email=payload.email, password_hash=get_password_hash(payload.password))
+    user = User(email=payload.email, password_hash=await get_password_hash(payload.password))
     session.add(user)
     await session.commit()
     return {"ok": True}
@@ -30,9 +30,15 @@ async def login(
 ) -> schemas.TokenResponse:
     result = await session.execute(select(User).where(User.email == form_data.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    token = create_access_token({"sub": str(user.id)}, expires_delta=timedelta(hours=12))
+    verified, new_hash = await verify_password(form_data.password, user.password_hash)
+    if not verified:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        user.password_hash = new_hash
+        await session.commit()
+    token = create_access_token(user_claims(user), expires_delta=timedelta(hours=12))
     return schemas.TokenResponse(access_token=token)
 
 
@@ -1,22 +1,57 @@
-from typing import List
+import json
+import logging
+from typing import AsyncIterator, List
 
-from fastapi import APIRouter
-from pydantic import BaseModel, Field
+import httpx
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 
-from ..ext.calil import check_availability
-from ..ext.opac_link import opac_isbn_url
+from ..ext.calil import check_availability, iter_availability
+from ..ext.calil_libraries import AmbiguousPlaceError
+from ..ext.resilience import UpstreamUnavailable
+from ..isbn import normalize_isbns
 
 router = APIRouter(tags=["availability"])
+logger = logging.getLogger(__name__)
 
 
 class AvailabilityIn(BaseModel):
     isbns: List[str] = Field(min_length=1)
     city: str
 
+    @field_validator("isbns")
+    @classmethod
+    def _normalize_isbns(cls, value: List[str]) -> List[str]:
+        isbns = normalize_isbns(value)
+        if not isbns:
+            raise ValueError("no valid ISBN")
+        return isbns
+
 
 @router.post("/availability")
-async def availability(payload: AvailabilityIn):
-    rows = await check_availability(payload.isbns, payload.city)
-    for row in rows:
-        row["opacUrl"] = opac_isbn_url(row["systemid"], row["isbn13"])
-    return rows
+async def availability(payload: AvailabilityIn) -> Response:
+    try:
+        rows = await check_availability(payload.isbns, payload.city)
+    except AmbiguousPlaceError as exc:
+        raise HTTPException(status_code=422, detail={"error": "ambiguous_city", "prefectures": exc.prefectures})
+    except (httpx.HTTPError, UpstreamUnavailable):
+        logger.warning("calil availability check failed", exc_info=True)
+        raise HTTPException(status_code=503, detail="calil_unavailable")
+    return Response("[" + ",".join(row.to_json() for row in rows) + "]", media_type="application/json")
+
+
+async def _ndjson_rows(payload: AvailabilityIn) -> AsyncIterator[str]:
+    try:
+        async for rows in iter_availability(payload.isbns, payload.city):
+            yield "".join(row.to_json() + "\n" for row in rows)
+    except AmbiguousPlaceError as exc:
+        yield json.dumps({"error": "ambiguous_city", "prefectures": exc.prefectures}, ensure_ascii=False) + "\n"
+    except (httpx.HTTPError, UpstreamUnavailable):
+        logger.warning("calil availability stream failed", exc_info=True)
+        yield json.dumps({"error": "calil_unavailable"}) + "\n"
+
+
+@router.post("/availability/stream")
+async def availability_stream(payload: AvailabilityIn) -> StreamingResponse:
+    return StreamingResponse(_ndjson_rows(payload), media_type="application/x-ndjson")
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from ..tracing import find_trace, recent_traces
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/traces")
+def list_traces(
+    limit: int = Query(default=20, ge=1, le=200),
+    min_duration_ms: float = Query(default=0.0, ge=0),
+) -> list[dict]:
+    return recent_traces(limit=limit, min_duration_ms=min_duration_ms)
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str) -> dict:
+    trace = find_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
@@ -7,11 +7,13 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from .. import schemas
 from ..deps import get_current_user, get_db
+from ..isbn import isbn13_to_10, normalize_isbn
 from ..models import Book, Goal, GoalBook, User
-from ..services.goals import attach_books_to_goal, compute_goal_progress, get_or_create_books, progress_ratio
+from ..services.goals import adjust_goal_progress, attach_books_to_goal, get_or_create_books, progress_ratio
 
 router = APIRouter(prefix="/goals", tags=["goals"])
 
@@ -27,15 +29,15 @@ async def create_goal(
         title=payload.title,
         description=payload.description,
         due_date=payload.due_date,
+        goal_books=[],
     )
     session.add(goal)
     await session.flush()
 
     books = await get_or_create_books(session, payload.recommended_isbns)
-    await attach_books_to_goal(session, goal, books)
+    total, done = await attach_books_to_goal(session, goal, books)
     await session.commit()
 
-    total, done = await compute_goal_progress(session, goal.id)
     return schemas.GoalOut(
         id=goal.id,
         title=goal.title,
@@ -50,8 +52,7 @@ async def create_goal(
     )
 
 
-async def goal_to_detail(session: AsyncSession, goal: Goal) -> schemas.GoalDetailOut:
-    total, done = await compute_goal_progress(session, goal.id)
+def goal_to_detail(goal: Goal) -> schemas.GoalDetailOut:
     books = []
     for gb in goal.goal_books:
         book = gb.book
@@ -80,26 +81,30 @@ async def goal_to_detail(session: AsyncSession, goal: Goal) -> schemas.GoalDetai
         created_at=goal.created_at,
         updated_at=goal.updated_at,
         archived=goal.archived,
-        progress=progress_ratio(total, done),
-        total_books=total,
-        done_books=done,
+        progress=progress_ratio(goal.total_books, goal.done_books),
+        total_books=goal.total_books,
+        done_books=goal.done_books,
         books=sorted(books, key=lambda x: x.position),
     )
 
 
+# Served from the primary, not the replica: the goal page refetches this right
+# after PATCHing a book status and must see its own write.
 @router.get("/{goal_id}", response_model=schemas.GoalDetailOut)
 async def get_goal(
     goal_id: UUID,
     session: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> schemas.GoalDetailOut:
-    goal = await session.get(Goal, goal_id)
-    if not goal or goal.user_id != current_user.id:
+    stmt = (
+        select(Goal)
+        .options(selectinload(Goal.goal_books).joinedload(GoalBook.book))
+        .where(Goal.id == goal_id, Goal.user_id == current_user.id)
+    )
+    goal = (await session.execute(stmt)).scalar_one_or_none()
+    if not goal:
         raise HTTPException(status_code=404, detail="Goal not found")
-    await session.refresh(goal, attribute_names=["goal_books"])
-    for gb in goal.goal_books:
-        await session.refresh(gb, attribute_names=["book"])
-    return await goal_to_detail(session, goal)
+    return goal_to_detail(goal)
 
 
 @router.patch("/{goal_id}/books/{isbn13}", response_model=schemas.GoalProgressResponse)
@@ -110,23 +115,36 @@ async def update_goal_book_status(
     session: Annotated[AsyncSession, Depends(get_db)],
     current_user: Annotated[User, Depends(get_current_user)],
 ) -> schemas.GoalProgressResponse:
+    # Books stored before ISBNs were normalized may hold the ISBN-10 or the
+    # raw string, so those spellings are matched too, preferring ISBN-13.
+    normalized = normalize_isbn(isbn13)
+    candidates = [normalized, isbn13_to_10(normalized), isbn13] if normalized else [isbn13]
     stmt = (
         select(GoalBook)
         .join(Goal, Goal.id == GoalBook.goal_id)
         .join(Book, Book.id == GoalBook.book_id)
-        .where(GoalBook.goal_id == goal_id, Book.isbn13 == isbn13, Goal.user_id == current_user.id)
+        .where(
+            GoalBook.goal_id == goal_id,
+            Book.isbn13.in_(list(dict.fromkeys(filter(None, candidates)))),
+            Goal.user_id == current_user.id,
+        )
+        .order_by(Book.isbn13 != candidates[0])
+        .limit(1)
+        .with_for_update(of=GoalBook)
     )
     result = await session.execute(stmt)
     goal_book = result.scalar_one_or_none()
     if not goal_book:
         raise HTTPException(status_code=404, detail="Book not found in goal")
+    done_delta = int(payload.status == "done") - int(goal_book.status == "done")
     goal_book.status = payload.status
     if payload.status == "done":
         goal_book.completed_at = datetime.utcnow()
     else:
         goal_book.completed_at = None
+    await session.flush()
+    total, done = await adjust_goal_progress(session, goal_id, done_delta=done_delta)
     await session.commit()
-    total, done = await compute_goal_progress(session, goal_id)
     return schemas.GoalProgressResponse(progress=progress_ratio(total, done), total_books=total, done_books=done)
 
 
@@ -143,7 +161,6 @@ async def archive_goal(
     goal.archived = payload.archived
     goal.updated_at = datetime.utcnow()
     await session.commit()
-    total, done = await compute_goal_progress(session, goal.id)
     return schemas.GoalOut(
         id=goal.id,
         title=goal.title,
@@ -152,7 +169,7 @@ async def archive_goal(
         created_at=goal.created_at,
         updated_at=goal.updated_at,
         archived=goal.archived,
-        progress=progress_ratio(total, done),
-        total_books=total,
-        done_books=done,
+        progress=progress_ratio(goal.total_books, goal.done_books),
+        total_books=goal.total_books,
+        done_books=goal.done_books,
     )
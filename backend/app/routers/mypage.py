@@ -1,34 +1,58 @@
 from __future__ import annotations
 
-from typing import Annotated
+import base64
+from datetime import datetime, timezone
+from typing import Annotated, Optional
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import DateTime, literal, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
-from ..deps import get_current_user, get_db
+from ..deps import get_current_user, get_read_db
 from ..models import Goal, User
-from ..services.goals import compute_goal_progress, progress_ratio
+from ..services.goals import progress_ratio
 
 router = APIRouter(prefix="/mypage", tags=["mypage"])
 
 
+def encode_cursor(goal: Goal) -> str:
+    raw = f"{goal.created_at.isoformat()}|{goal.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, goal_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        ts = datetime.fromisoformat(created_at)
+        return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)), UUID(goal_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+
+
 @router.get("/goals")
 async def list_goals(
-    session: Annotated[AsyncSession, Depends(get_db)],
+    session: Annotated[AsyncSession, Depends(get_read_db)],
     current_user: Annotated[User, Depends(get_current_user)],
     include_archived: bool = Query(default=False),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None),
 ) -> dict:
     stmt = select(Goal).where(Goal.user_id == current_user.id)
     if not include_archived:
         stmt = stmt.where(Goal.archived.is_(False))
-    stmt = stmt.order_by(Goal.created_at.desc())
+    if cursor:
+        # goals.created_at is TIMESTAMPTZ; the model's naive DateTime would bind
+        # the aware cursor as TIMESTAMP, which asyncpg cannot encode.
+        created_at, goal_id = decode_cursor(cursor)
+        after = tuple_(literal(created_at, DateTime(timezone=True)), literal(goal_id, Goal.id.type))
+        stmt = stmt.where(tuple_(Goal.created_at, Goal.id) < after)
+    stmt = stmt.order_by(Goal.created_at.desc(), Goal.id.desc()).limit(limit + 1)
     result = await session.execute(stmt)
-    goals = result.scalars().unique().all()
+    goals = result.scalars().all()
     items = []
-    for goal in goals:
-        total, done = await compute_goal_progress(session, goal.id)
+    for goal in goals[:limit]:
         items.append(
             schemas.GoalOut(
                 id=goal.id,
@@ -38,9 +62,10 @@ async def list_goals(
                 created_at=goal.created_at,
                 updated_at=goal.updated_at,
                 archived=goal.archived,
-                progress=progress_ratio(total, done),
-                total_books=total,
-                done_books=done,
+                progress=progress_ratio(goal.total_books, goal.done_books),
+                total_books=goal.total_books,
+                done_books=goal.done_books,
             )
         )
-    return {"items": items}
+    next_cursor = encode_cursor(goals[limit - 1]) if len(goals) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
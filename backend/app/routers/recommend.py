@@ -1,17 +1,38 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Request, Response
 
+from ..config import get_settings
 from ..schemas import BookOut
-from ..services.recommendation import generate_recommendations
+from ..services.recommendation_cache import cached_recommendations
+
+settings = get_settings()
 
 router = APIRouter(tags=["recommend"])
 
 
-@router.post("/recommend", response_model=List[BookOut])
-async def recommend(payload: dict) -> List[BookOut]:
-    purpose = str(payload.get("purpose", "")).strip()
+async def _recommend(purpose: str, request: Request, response: Response) -> List[BookOut] | Response:
+    purpose = purpose.strip()
     if not purpose:
         return []
-    books = await generate_recommendations(purpose)
-    return [BookOut(**book) for book in books]
+    cached = await cached_recommendations(purpose)
+    headers = {
+        "ETag": cached["etag"],
+        "Cache-Control": f"private, max-age={settings.recommend_cache_ttl}",
+    }
+    if request.headers.get("if-none-match") == cached["etag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return [BookOut(**book) for book in cached["items"]]
+
+
+@router.post("/recommend", response_model=List[BookOut])
+async def recommend(payload: dict, request: Request, response: Response) -> List[BookOut] | Response:
+    return await _recommend(str(payload.get("purpose", "")), request, response)
+
+
+@router.get("/recommend", response_model=List[BookOut])
+async def recommend_get(
+    request: Request, response: Response, purpose: str = Query(default="")
+) -> List[BookOut] | Response:
+    return await _recommend(purpose, request, response)
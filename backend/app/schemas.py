@@ -4,7 +4,9 @@ from datetime import date, datetime
 from typing import List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from .isbn import normalize_isbn, normalize_isbns
 
 
 class TokenResponse(BaseModel):
@@ -43,6 +45,7 @@ class BookBase(BaseModel):
 
 class BookOut(BookBase):
     reason: Optional[str] = None
+    sources: List[str] = Field(default_factory=list)
 
 
 class GoalBookOut(BaseModel):
@@ -61,6 +64,14 @@ class GoalBase(BaseModel):
 class GoalCreate(GoalBase):
     recommended_isbns: List[str] = Field(default_factory=list)
 
+    @field_validator("recommended_isbns")
+    @classmethod
+    def _normalize_isbns(cls, value: List[str]) -> List[str]:
+        invalid = [isbn for isbn in value if normalize_isbn(isbn) is None]
+        if invalid:
+            raise ValueError(f"invalid ISBN: {', '.join(invalid)}")
+        return normalize_isbns(value)
+
 
 class GoalOut(GoalBase):
     id: UUID
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import String, any_, bindparam, func, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..cache import normalize_query
+from ..config import get_settings
+from ..deps import SessionLocal
+from ..models import Book, GoalBook
+from .embedding import book_text, get_embedder
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CATALOG_FIELDS = ("title", "author", "publisher", "pubyear", "ndc", "ndlc")
+
+_pending_writes: set[asyncio.Task] = set()
+
+
+def book_to_dict(book: Book) -> Dict[str, Any]:
+    return {"isbn13": book.isbn13, **{field: getattr(book, field) for field in CATALOG_FIELDS}}
+
+
+async def search_local_catalog(session: AsyncSession, purpose: str, limit: int) -> List[Dict[str, Any]]:
+    q = normalize_query(purpose)
+    score = func.greatest(func.word_similarity(q, Book.title), func.word_similarity(q, func.coalesce(Book.author, "")))
+    stmt = (
+        select(Book)
+        .where(or_(Book.title.op("%>")(q), Book.author.op("%>")(q)))
+        .order_by(score.desc())
+        .limit(limit)
+    )
+    result = await session.scalars(stmt)
+    return [book_to_dict(book) for book in result]
+
+
+async def search_semantic_catalog(session: AsyncSession, purpose: str, limit: int) -> List[Dict[str, Any]]:
+    embedder = get_embedder()
+    vector = (await asyncio.to_thread(embedder.embed, [purpose]))[0]
+    distance = Book.embedding.cosine_distance(vector)
+    stmt = (
+        select(Book)
+        .where(
+            Book.embedding.is_not(None),
+            Book.embedding_model == embedder.name,
+            distance <= settings.semantic_max_distance,
+        )
+        .order_by(distance)
+        .limit(limit)
+    )
+    result = await session.scalars(stmt)
+    return [book_to_dict(book) for book in result]
+
+
+async def popularity_counts(session: AsyncSession, isbns: List[str]) -> Dict[str, int]:
+    if not isbns:
+        return {}
+    stmt = (
+        select(Book.isbn13, func.count(GoalBook.goal_id))
+        .join(GoalBook, GoalBook.book_id == Book.id)
+        .where(Book.isbn13 == any_(bindparam("isbns", isbns, type_=ARRAY(String))))
+        .group_by(Book.isbn13)
+    )
+    result = await session.execute(stmt)
+    return {isbn: count for isbn, count in result.all()}
+
+
+async def store_catalog_books(session: AsyncSession, items: Iterable[Dict[str, Any]]) -> None:
+    rows: dict[str, dict[str, Any]] = {}
+    for item in items:
+        if item.get("isbn13") and item.get("title") and item["isbn13"] not in rows:
+            rows[item["isbn13"]] = {"isbn13": item["isbn13"], **{field: item.get(field) for field in CATALOG_FIELDS}}
+    if not rows:
+        return
+    # Concurrent upserts lock conflicting rows in insert order; a fixed order
+    # keeps two overlapping batches from deadlocking.
+    values = [rows[isbn] for isbn in sorted(rows)]
+    embedder = get_embedder()
+    vectors = await asyncio.to_thread(embedder.embed, [book_text(row) for row in values])
+    for row, vector in zip(values, vectors):
+        row["embedding"] = vector
+        row["embedding_model"] = embedder.name
+    stmt = insert(Book).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Book.isbn13],
+        set_={
+            **{field: func.coalesce(getattr(stmt.excluded, field), getattr(Book, field)) for field in CATALOG_FIELDS},
+            "embedding": stmt.excluded.embedding,
+            "embedding_model": stmt.excluded.embedding_model,
+        },
+    )
+    await session.execute(stmt)
+    await session.commit()
+
+
+def store_catalog_books_later(items: List[Dict[str, Any]]) -> None:
+    async def _store() -> None:
+        try:
+            async with SessionLocal() as session:
+                await store_catalog_books(session, items)
+        except Exception:
+            logger.warning("failed to store %d catalog books", len(items), exc_info=True)
+
+    task = asyncio.create_task(_store())
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
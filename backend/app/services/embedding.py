@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import importlib.util
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Protocol, Sequence
+
+import numpy as np
+
+from ..config import get_settings
+
+settings = get_settings()
+
+EMBEDDING_DIM = 768
+
+
+class Embedder(Protocol):
+    # Stored next to each vector; rows embedded by another model are
+    # re-embedded by app.jobs.embed_books and skipped by semantic search.
+    name: str
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    # Signed feature hashing of character 1-3 grams. Needs no model files and
+    # works on unsegmented Japanese, where word tokenisation is unavailable.
+
+    def __init__(self, dim: int = EMBEDDING_DIM, ngram_range: tuple[int, int] = (1, 3)) -> None:
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-{ngram_range[0]}-{ngram_range[1]}"
+
+    def _hashes(self, text: str) -> list[int]:
+        text = " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+        low, high = self.ngram_range
+        return [
+            zlib.crc32(text[i : i + n].encode())
+            for n in range(low, high + 1)
+            for i in range(len(text) - n + 1)
+            if not text[i : i + n].isspace()
+        ]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        per_text = [self._hashes(text) for text in texts]
+        counts = np.fromiter((len(hashes) for hashes in per_text), dtype=np.int64, count=len(per_text))
+        hashes = np.fromiter((h for row in per_text for h in row), dtype=np.uint32, count=int(counts.sum()))
+        rows = np.repeat(np.arange(len(per_text), dtype=np.int64), counts)
+        signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+        flat = np.bincount(rows * self.dim + hashes % self.dim, weights=signs, minlength=len(per_text) * self.dim)
+        out = flat.reshape(len(per_text), self.dim).astype(np.float32)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if self.model.get_sentence_embedding_dimension() != EMBEDDING_DIM:
+            raise ValueError(f"{model_name} does not produce {EMBEDDING_DIM}-dimensional embeddings")
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+@lru_cache
+def get_embedder() -> Embedder:
+    if not settings.embedding_model:
+        return HashingEmbedder()
+    if importlib.util.find_spec("sentence_transformers") is None:
+        raise RuntimeError(
+            f"EMBEDDING_MODEL={settings.embedding_model} needs sentence-transformers; "
+            "install it or unset EMBEDDING_MODEL to use the hashing embedder"
+        )
+    return SentenceTransformerEmbedder(settings.embedding_model)
+
+
+def book_text(book: Dict[str, Any]) -> str:
+    return " ".join(str(book[field]) for field in ("title", "author", "ndc") if book.get(field))
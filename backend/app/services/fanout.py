@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Source:
+    name: str
+    call: Callable[[], Awaitable[list[dict[str, Any]]]]
+    deadline: float
+
+
+@dataclass
+class FanOutResult:
+    results: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    failed: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def contributed(self) -> list[str]:
+        return [name for name, items in self.results.items() if items]
+
+
+async def _run(source: Source) -> list[dict[str, Any]]:
+    with span("source", source=source.name, deadline=source.deadline):
+        return await asyncio.wait_for(source.call(), timeout=source.deadline)
+
+
+async def fan_out(sources: list[Source]) -> FanOutResult:
+    tasks: Mapping[str, asyncio.Task] = {source.name: asyncio.create_task(_run(source)) for source in sources}
+    await asyncio.wait(tasks.values())
+    outcome = FanOutResult()
+    for name, task in tasks.items():
+        exc = task.exception()
+        if exc is None:
+            outcome.results[name] = task.result()
+            continue
+        reason = "timeout" if isinstance(exc, asyncio.TimeoutError) else type(exc).__name__
+        logger.warning("catalog source %s failed: %s", name, reason)
+        outcome.failed[name] = reason
+    return outcome
@@ -3,47 +3,92 @@ from __future__ import annotations
 from typing import Iterable
 from uuid import UUID
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import String, any_, bindparam, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Book, Goal, GoalBook
+from ..isbn import normalize_isbns
+from ..models import Book, Goal, GoalBook, goal_progress
+
+
+async def _select_books(session: AsyncSession, isbns: list[str]) -> dict[str, Book]:
+    stmt = select(Book).where(Book.isbn13 == any_(bindparam("isbns", isbns, type_=ARRAY(String))))
+    result = await session.scalars(stmt)
+    return {book.isbn13: book for book in result}
 
 
 async def get_or_create_books(session: AsyncSession, isbns: Iterable[str]) -> list[Book]:
-    books: list[Book] = []
-    for idx, isbn in enumerate(isbns):
-        isbn = isbn.strip()
-        if not isbn:
-            continue
-        result = await session.execute(select(Book).where(Book.isbn13 == isbn))
-        book = result.scalar_one_or_none()
-        if not book:
-            book = Book(isbn13=isbn, title=f"書籍 {isbn}")
-            session.add(book)
-            await session.flush()
-        books.append(book)
-    return books
-
-
-async def attach_books_to_goal(session: AsyncSession, goal: Goal, books: list[Book]) -> None:
+    ordered = normalize_isbns(isbns)
+    if not ordered:
+        return []
+    found = await _select_books(session, ordered)
+    missing = [isbn for isbn in ordered if isbn not in found]
+    if missing:
+        stmt = insert(Book).on_conflict_do_nothing(index_elements=[Book.isbn13]).returning(Book)
+        created = await session.scalars(stmt, [{"isbn13": isbn, "title": f"書籍 {isbn}"} for isbn in missing])
+        found.update((book.isbn13, book) for book in created)
+        # Rows inserted concurrently by another request are skipped by ON CONFLICT.
+        lost = [isbn for isbn in missing if isbn not in found]
+        if lost:
+            found.update(await _select_books(session, lost))
+    return [found[isbn] for isbn in ordered]
+
+
+async def adjust_goal_progress(
+    session: AsyncSession, goal_id: UUID, total_delta: int = 0, done_delta: int = 0
+) -> tuple[int, int]:
+    if not total_delta and not done_delta:
+        result = await session.execute(select(Goal.total_books, Goal.done_books).where(Goal.id == goal_id))
+        total, done = result.one()
+        return total, done
+    stmt = (
+        update(Goal)
+        .where(Goal.id == goal_id)
+        .values(total_books=Goal.total_books + total_delta, done_books=Goal.done_books + done_delta)
+        .returning(Goal.total_books, Goal.done_books)
+    )
+    result = await session.execute(stmt)
+    total, done = result.one()
+    return total, done
+
+
+async def attach_books_to_goal(session: AsyncSession, goal: Goal, books: list[Book]) -> tuple[int, int]:
+    by_book_id = {gb.book_id: gb for gb in goal.goal_books}
+    added = 0
     for pos, book in enumerate(books, start=1):
-        existing = next((gb for gb in goal.goal_books if gb.book_id == book.id), None)
+        existing = by_book_id.get(book.id)
         if existing:
             existing.position = pos
         else:
             goal.goal_books.append(
                 GoalBook(goal_id=goal.id, book_id=book.id, position=pos, status="unread")
             )
+            added += 1
     await session.flush()
+    return await adjust_goal_progress(session, goal.id, total_delta=added)
 
 
-async def compute_goal_progress(session: AsyncSession, goal_id: UUID) -> tuple[int, int]:
-    stmt: Select = select(func.count(GoalBook.book_id), func.count().filter(GoalBook.status == "done")).where(
-        GoalBook.goal_id == goal_id
+async def reconcile_goal_progress(session: AsyncSession) -> list[UUID]:
+    # Drifted goals are locked first and recounted in a second statement. A
+    # writer that attached or toggled books either committed before the lock
+    # (and the recount sees it) or waits on it and applies its delta on top,
+    # so concurrent increments are never overwritten with a stale count.
+    drifted = or_(Goal.total_books != goal_progress.c.total_books, Goal.done_books != goal_progress.c.done_books)
+    locked = await session.scalars(
+        select(Goal.id).where(goal_progress.c.goal_id == Goal.id, drifted).with_for_update(of=Goal)
+    )
+    goal_ids = list(locked)
+    if not goal_ids:
+        return []
+    stmt = (
+        update(Goal)
+        .where(goal_progress.c.goal_id == Goal.id, Goal.id.in_(goal_ids), drifted)
+        .values(total_books=goal_progress.c.total_books, done_books=goal_progress.c.done_books)
+        .returning(Goal.id)
+        .execution_options(synchronize_session=False)
     )
     result = await session.execute(stmt)
-    total, done = result.one()
-    return int(total or 0), int(done or 0)
+    return list(result.scalars())
 
 
 def progress_ratio(total: int, done: int) -> float:
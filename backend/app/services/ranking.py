@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import unicodedata
+from datetime import date
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+FEATURES = ("term", "ndc", "recency", "agreement", "popularity")
+WEIGHTS = np.array([0.4, 0.15, 0.15, 0.15, 0.15], dtype=np.float32)
+RECENCY_HALF_LIFE = 10.0
+DEFAULT_REASON = "目的との主題一致"
+
+
+def _reason(feature: str, book: Dict[str, Any], ndc_class: int) -> str:
+    if feature == "term":
+        return "目的のキーワードと書名が一致"
+    if feature == "ndc":
+        return f"目的に近い分類（NDC {ndc_class}類）"
+    if feature == "recency":
+        return f"比較的新しい刊行（{book['pubyear']}年）"
+    if feature == "agreement":
+        return "複数の検索経路で一致"
+    return "他の利用者の目標にも多く追加"
+
+
+def _bigram_codes(text: str) -> np.ndarray:
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    return (codes[:-1] << 21) | codes[1:]
+
+
+def term_overlap(purpose: str, texts: Sequence[str]) -> np.ndarray:
+    # Character bigrams work for unsegmented Japanese. All candidate texts are
+    # joined with NUL separators and matched against the purpose in one pass.
+    wanted = np.unique(_bigram_codes(" ".join(unicodedata.normalize("NFKC", purpose).casefold().split())))
+    n = len(texts)
+    if not wanted.size or not n:
+        return np.zeros(n, dtype=np.float32)
+    joined = unicodedata.normalize("NFKC", "\0".join(texts)).casefold()
+    lengths = np.fromiter(map(len, joined.split("\0")), dtype=np.int64, count=n)
+    rows = np.repeat(np.arange(n), lengths + 1)[: len(joined) - 1]
+    hits = np.bincount(rows, weights=np.isin(_bigram_codes(joined), wanted), minlength=n)
+    title_coverage = hits / np.maximum(lengths - 1, 1)
+    purpose_coverage = hits / wanted.size
+    return np.clip(0.5 * title_coverage + 0.5 * purpose_coverage, 0.0, 1.0).astype(np.float32)
+
+
+def feature_matrix(
+    purpose: str,
+    books: Sequence[Dict[str, Any]],
+    popularity: Mapping[str, int],
+    current_year: int,
+) -> tuple[np.ndarray, int]:
+    n = len(books)
+    term = term_overlap(purpose, [(book.get("title") or "").replace("\0", "") for book in books])
+
+    ndc_classes = np.fromiter(
+        (int(ndc[0]) if (ndc := book.get("ndc")) and ndc[0].isdigit() else -1 for book in books), dtype=np.int8, count=n
+    )
+    has_ndc = ndc_classes >= 0
+    # The purpose has no classification of its own, so infer it from the
+    # classes of the candidates that match it best.
+    class_weight = np.bincount(ndc_classes[has_ndc], weights=term[has_ndc], minlength=10)
+    ndc_class = int(class_weight.argmax()) if class_weight.any() else -1
+    ndc = (ndc_classes == ndc_class) & has_ndc
+
+    years = np.fromiter((book.get("pubyear") or 0 for book in books), dtype=np.float32, count=n)
+    age = np.clip(current_year - years, 0.0, None)
+    recency = np.where(years > 0, np.exp2(-age / RECENCY_HALF_LIFE), 0.0)
+
+    source_counts = np.fromiter((len(book.get("sources") or ()) for book in books), dtype=np.float32, count=n)
+    agreement = np.clip(source_counts - 1, 0.0, None) / max(float(source_counts.max(initial=1)) - 1, 1.0)
+
+    adds = np.log1p(np.fromiter((popularity.get(book["isbn13"], 0) for book in books), dtype=np.float32, count=n))
+    popular = adds / max(float(adds.max(initial=0)), 1.0)
+
+    return np.column_stack([term, ndc, recency, agreement, popular]).astype(np.float32), ndc_class
+
+
+def rank_books(
+    purpose: str,
+    books: Sequence[Dict[str, Any]],
+    popularity: Mapping[str, int] | None = None,
+    limit: int = 12,
+    current_year: int | None = None,
+) -> List[Dict[str, Any]]:
+    if not books:
+        return []
+    features, ndc_class = feature_matrix(purpose, books, popularity or {}, current_year or date.today().year)
+    contributions = features * WEIGHTS
+    scores = contributions.sum(axis=1)
+    k = min(limit, len(books))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.lexsort((top, -scores[top]))]
+    top_features = np.argsort(-contributions[top], axis=1)[:, :2]
+
+    ranked = []
+    for row, idx in enumerate(top):
+        book = books[idx]
+        reasons = [
+            _reason(FEATURES[f], book, ndc_class) for f in top_features[row] if contributions[idx, f] > 0.02
+        ]
+        ranked.append({**book, "score": float(scores[idx]), "reason": "・".join(reasons) or DEFAULT_REASON})
+    return ranked
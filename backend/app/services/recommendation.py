@@ -2,24 +2,66 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
-from ..ext.ndl import search_ndl_by_query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
 from ..ext.cinii import search_cinii_by_title
+from ..ext.ndl import search_ndl_by_query
+from ..tracing import span, traced
+from .catalog import popularity_counts, search_local_catalog, search_semantic_catalog, store_catalog_books_later
+from .fanout import Source, fan_out
+from .ranking import rank_books
+
+settings = get_settings()
+
+
+def _catalog_sources(purpose: str) -> list[Source]:
+    return [
+        Source("ndl", lambda: search_ndl_by_query(purpose, limit=30), settings.ndl_deadline),
+        Source("cinii", lambda: search_cinii_by_title(purpose, limit=20), settings.cinii_deadline),
+    ]
+
+
+async def _gather_candidates(session: AsyncSession, purpose: str, limit: int) -> dict[str, list[Dict[str, Any]]]:
+    wanted = max(limit, settings.local_catalog_min_results)
+    local = {
+        "semantic": await search_semantic_catalog(session, purpose, limit=wanted),
+        "local": await search_local_catalog(session, purpose, limit=wanted),
+    }
+    found = {book["isbn13"] for books in local.values() for book in books}
+    if len(found) >= settings.local_catalog_min_results:
+        return local
+    outcome = await fan_out(_catalog_sources(purpose))
+    fetched = [book for books in outcome.results.values() for book in books]
+    if fetched:
+        store_catalog_books_later(fetched)
+    return {**local, **outcome.results}
 
 
-async def generate_recommendations(purpose: str, limit: int = 12) -> List[Dict[str, Any]]:
-    ndl_results = await search_ndl_by_query(purpose, limit=30)
-    cinii_results = await search_cinii_by_title(purpose, limit=20)
+@traced("recommend.generate")
+async def generate_recommendations(session: AsyncSession, purpose: str, limit: int = 12) -> List[Dict[str, Any]]:
+    with span("recommend.gather"):
+        candidates = await _gather_candidates(session, purpose, limit)
 
-    merged: dict[str, dict[str, Any]] = {}
-    for book in ndl_results + cinii_results:
-        isbn = book.get("isbn13")
-        if not isbn:
-            continue
-        if isbn not in merged:
-            merged[isbn] = book
+    with span("recommend.dedupe") as dedupe:
+        merged: dict[str, dict[str, Any]] = {}
+        for name, books in candidates.items():
+            for book in books:
+                isbn = book.get("isbn13")
+                if not isbn:
+                    continue
+                if isbn not in merged:
+                    merged[isbn] = {**book, "sources": []}
+                if name not in merged[isbn]["sources"]:
+                    merged[isbn]["sources"].append(name)
+        dedupe.set("candidates", len(merged))
 
+    pool = list(merged.values())
+    popularity = await popularity_counts(session, list(merged))
+    with span("recommend.rank"):
+        ranked = rank_books(purpose, pool, popularity, limit=limit)
     final = []
-    for idx, book in enumerate(list(merged.values())[:limit]):
+    for book in ranked:
         final.append(
             {
                 "isbn13": book.get("isbn13"),
@@ -27,9 +69,10 @@ async def generate_recommendations(purpose: str, limit: int = 12) -> List[Dict[s
                 "author": book.get("author"),
                 "publisher": book.get("publisher"),
                 "pubyear": book.get("pubyear"),
-                "reason": "目的との主題一致（MVPルール）",
+                "reason": book["reason"],
                 "ndc": book.get("ndc"),
                 "ndlc": book.get("ndlc"),
+                "sources": book["sources"],
             }
         )
     return final
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict
+
+import redis.asyncio as aioredis
+
+from ..cache import SearchCache, normalize_query, register_cache
+from ..config import get_settings
+from ..deps import SessionLocal
+from ..redis_client import redis
+from .recommendation import generate_recommendations
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+POPULAR_KEY = "rec:popular"
+REFRESH_LOCK_KEY = "rec:popular:refresh"
+MAX_TRACKED_PURPOSES = 10_000
+
+recommend_cache = register_cache(
+    SearchCache("rec", settings.recommend_cache_ttl, settings.recommend_cache_stale_ttl)
+)
+_purpose_counts: Counter[str] = Counter()
+
+
+async def _compute(purpose: str) -> Dict[str, Any]:
+    async with SessionLocal() as session:
+        items = await generate_recommendations(session, purpose)
+    body = json.dumps(items, ensure_ascii=False, sort_keys=True)
+    return {"etag": f'"{hashlib.sha1(body.encode()).hexdigest()}"', "items": items}
+
+
+async def _count_purpose(purpose: str) -> None:
+    if not redis:
+        _purpose_counts[purpose] += 1
+        if len(_purpose_counts) > MAX_TRACKED_PURPOSES * 2:
+            top = _purpose_counts.most_common(MAX_TRACKED_PURPOSES)
+            _purpose_counts.clear()
+            _purpose_counts.update(dict(top))
+        return
+    try:
+        await redis.zincrby(POPULAR_KEY, 1, purpose)
+    except aioredis.RedisError:
+        logger.warning("failed to count purpose", exc_info=True)
+
+
+async def cached_recommendations(purpose: str) -> Dict[str, Any]:
+    purpose = normalize_query(purpose)
+    await _count_purpose(purpose)
+    return await recommend_cache.get_or_fetch(purpose, lambda: _compute(purpose))
+
+
+async def _popular_purposes(n: int) -> list[str]:
+    if not redis:
+        return [purpose for purpose, _ in _purpose_counts.most_common(n)]
+    await redis.zremrangebyrank(POPULAR_KEY, 0, -(MAX_TRACKED_PURPOSES + 1))
+    return [purpose.decode() for purpose in await redis.zrevrange(POPULAR_KEY, 0, n - 1)]
+
+
+async def refresh_popular_recommendations() -> int:
+    refreshed = 0
+    # Refresh anything that would expire before the next pass.
+    margin = settings.recommend_refresh_interval * 1.5
+    for purpose in await _popular_purposes(settings.recommend_refresh_top_n):
+        try:
+            if await recommend_cache.refresh_if_expiring(purpose, lambda p=purpose: _compute(p), margin):
+                refreshed += 1
+        except Exception:
+            logger.warning("failed to refresh recommendations for %r", purpose, exc_info=True)
+    return refreshed
+
+
+async def _claim_refresh() -> bool:
+    # Every worker runs the loop; the first to take the lock refreshes for this
+    # interval. The lock is left to expire so a crashed leader is replaced.
+    if not redis:
+        return True
+    try:
+        ttl = max(1, int(settings.recommend_refresh_interval * 0.9))
+        return bool(await redis.set(REFRESH_LOCK_KEY, "1", nx=True, ex=ttl))
+    except aioredis.RedisError:
+        logger.warning("failed to claim popular recommendation refresh", exc_info=True)
+        return True
+
+
+async def refresh_popular_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.recommend_refresh_interval)
+        if not await _claim_refresh():
+            continue
+        try:
+            refreshed = await refresh_popular_recommendations()
+            logger.info("refreshed %d popular recommendation payloads", refreshed)
+        except Exception:
+            logger.warning("popular recommendation refresh failed", exc_info=True)
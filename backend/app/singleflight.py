@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import redis.asyncio as aioredis
+
+from .config import get_settings
+from .redis_client import redis
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one upstream call: inside a
+    # worker through a shared task, across workers through a Redis lock whose
+    # holder publishes on a channel once its result has been cached.
+
+    def __init__(self, name: str, lock_ttl: float | None = None) -> None:
+        self.name = name
+        self.lock_ttl = lock_ttl or settings.singleflight_lock_ttl
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]] | None = None,
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn, lookup))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Any | None]] | None,
+    ) -> Any:
+        if not redis or lookup is None:
+            return await fn()
+        lock_key = f"sf:{self.name}:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except aioredis.RedisError:
+            logger.warning("single-flight lock failed for %s", lock_key, exc_info=True)
+            return await fn()
+        if acquired:
+            try:
+                return await fn()
+            finally:
+                # Release before publishing: a follower subscribing in between
+                # must see the lock gone rather than wait out lock_ttl.
+                try:
+                    await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                    await redis.publish(lock_key, "done")
+                except aioredis.RedisError:
+                    logger.warning("single-flight release failed for %s", lock_key, exc_info=True)
+        if await self._wait_for_leader(lock_key):
+            cached = await lookup()
+            if cached is not None:
+                self.coalesced += 1
+                return cached
+        return await fn()
+
+    async def _wait_for_leader(self, lock_key: str) -> bool:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(lock_key)
+            # The holder may have finished between our SET NX and SUBSCRIBE.
+            if not await redis.exists(lock_key):
+                return True
+            deadline = time.monotonic() + self.lock_ttl
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None:
+                    return True
+            return False
+        except aioredis.RedisError:
+            logger.warning("single-flight wait failed for %s", lock_key, exc_info=True)
+            return False
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import httpx
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attrs", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str | None, attrs: dict[str, Any]) -> None:
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time_ns()
+        self.end = 0
+        self.attrs = attrs
+        self.error: str | None = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+
+    def finish(self, exc: BaseException | None = None) -> None:
+        self.end = time.time_ns()
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.error = f"{type(exc).__name__}: {exc}"[:200]
+        if self.parent_id is None:
+            _finish(self.trace)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start,
+            "duration_ms": (self.end - self.start) / 1e6 if self.end else None,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class Trace:
+    __slots__ = ("trace_id", "remote_parent", "spans", "dropped")
+
+    def __init__(self, trace_id: str | None = None, remote_parent: str | None = None) -> None:
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.remote_parent = remote_parent
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        root = self.spans[0] if self.spans else None
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "duration_ms": root.to_dict()["duration_ms"] if root else None,
+            "dropped_spans": self.dropped,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+# The active span of the current task. asyncio copies the context into every
+# task it creates, so child tasks parent their spans correctly.
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+_finished: deque[Trace] = deque(maxlen=settings.trace_buffer_size)
+
+
+class _SpanScope:
+    __slots__ = ("span", "token")
+
+    def __init__(self, span: Span) -> None:
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self.token)
+        self.span.finish(exc)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+
+NOOP = _NoopSpan()
+
+
+def start_span(name: str, **attrs: Any) -> Span | None:
+    # Records a child of the active span without making it active; the caller
+    # must finish() it.
+    parent = _current.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if len(trace.spans) >= settings.trace_max_spans:
+        trace.dropped += 1
+        return None
+    child = Span(trace, name, parent.span_id, attrs)
+    trace.spans.append(child)
+    return child
+
+
+def span(name: str, **attrs: Any) -> _SpanScope | _NoopSpan:
+    # Outside a sampled trace this is one ContextVar read and returns a shared
+    # no-op, so instrumentation can stay on hot paths.
+    child = start_span(name, **attrs)
+    return NOOP if child is None else _SpanScope(child)
+
+
+def start_trace(
+    name: str,
+    trace_id: str | None = None,
+    remote_parent: str | None = None,
+    sampled: bool | None = None,
+    **attrs: Any,
+) -> _SpanScope | _NoopSpan:
+    if sampled is None:
+        sampled = random.random() < settings.trace_sample_rate
+    if not sampled:
+        return NOOP
+    trace = Trace(trace_id, remote_parent)
+    root = Span(trace, name, None, attrs)
+    trace.spans.append(root)
+    return _SpanScope(root)
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _finish(trace: Trace) -> None:
+    _finished.append(trace)
+    if _exporter is not None:
+        _exporter.submit(trace)
+
+
+def recent_traces(limit: int = 50, min_duration_ms: float = 0.0) -> list[dict[str, Any]]:
+    traces = [trace.to_dict() for trace in reversed(_finished)]
+    return [trace for trace in traces if (trace["duration_ms"] or 0) >= min_duration_ms][:limit]
+
+
+def find_trace(trace_id: str) -> dict[str, Any] | None:
+    for trace in _finished:
+        if trace.trace_id == trace_id:
+            return trace.to_dict()
+    return None
+
+
+def parse_traceparent(header: bytes | None) -> tuple[str | None, str | None, bool | None]:
+    # W3C traceparent: version-traceid-parentid-flags. An upstream sampling
+    # decision is honoured; otherwise we sample locally.
+    if not header:
+        return None, None, None
+    parts = header.decode("latin-1").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None, None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = next((value for name, value in scope["headers"] if name == b"traceparent"), None)
+        trace_id, remote_parent, sampled = parse_traceparent(traceparent)
+        scope_span = start_trace("http", trace_id, remote_parent, sampled, method=scope["method"], path=scope["path"])
+        if scope_span is NOOP:
+            await self.app(scope, receive, send)
+            return
+
+        with scope_span as root:
+
+            async def send_with_trace(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    root.set("status", message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"x-trace-id", root.trace.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                root.name = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+class OTLPExporter:
+    # Ships finished traces as OTLP/HTTP JSON in batches from a background
+    # task, so request handling never waits on the collector.
+
+    def __init__(self, endpoint: str, service_name: str) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.queue: deque[Trace] = deque(maxlen=settings.trace_buffer_size * 4)
+        self.task: asyncio.Task | None = None
+
+    def submit(self, trace: Trace) -> None:
+        self.queue.append(trace)
+
+    def _payload(self, traces: list[Trace]) -> dict[str, Any]:
+        spans = []
+        for trace in traces:
+            for item in trace.spans:
+                spans.append(
+                    {
+                        "traceId": trace.trace_id,
+                        "spanId": item.span_id,
+                        "parentSpanId": item.parent_id or trace.remote_parent or "",
+                        "name": item.name,
+                        "kind": 2 if item.parent_id is None else 1,
+                        "startTimeUnixNano": str(item.start),
+                        "endTimeUnixNano": str(item.end or item.start),
+                        "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in item.attrs.items()],
+                        "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+                    }
+                )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                    "scopeSpans": [{"scope": {"name": "libremore"}, "spans": spans}],
+                }
+            ]
+        }
+
+    async def run(self) -> None:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            while True:
+                await asyncio.sleep(settings.otlp_export_interval)
+                await self.flush(client)
+
+    async def flush(self, client: httpx.AsyncClient) -> None:
+        traces = []
+        while self.queue and len(traces) < 256:
+            traces.append(self.queue.popleft())
+        if not traces:
+            return
+        try:
+            resp = await client.post(self.url, json=self._payload(traces))
+            resp.raise_for_status()
+        except httpx.HTTPError:
+            logger.warning("OTLP export of %d traces failed", len(traces), exc_info=True)
+
+
+_exporter: OTLPExporter | None = (
+    OTLPExporter(settings.otlp_endpoint, settings.otlp_service_name) if settings.otlp_endpoint else None
+)
+
+
+async def export_loop() -> None:
+    if _exporter is None:
+        return
+    with contextlib.suppress(asyncio.CancelledError):
+        await _exporter.run()
+
+
+def instrument_engine(engine: Any) -> None:
+    # SQL spans are kept on the connection between the before and after hooks,
+    # which run outside any `with` block of the caller.
+    def before(conn, cursor, statement, parameters, context, executemany) -> None:
+        sql_span = start_span("sql", statement=statement[:300], executemany=executemany)
+        if sql_span is not None:
+            conn.info.setdefault("trace_spans", []).append(sql_span)
+
+    def after(conn, cursor, statement, parameters, context, executemany) -> None:
+        stack = conn.info.get("trace_spans")
+        if stack:
+            stack.pop().finish()
+
+    def on_error(exception_context) -> None:
+        conn = exception_context.connection
+        stack = conn.info.get("trace_spans") if conn is not None else None
+        if stack:
+            stack.pop().finish(exception_context.original_exception)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before)
+    event.listen(engine.sync_engine, "after_cursor_execute", after)
+    event.listen(engine.sync_engine, "handle_error", on_error)
@@ -0,0 +1,51 @@
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.isbn import isbn10_to_13, isbn13_check_digit, normalize_isbn, normalize_isbns  # noqa: E402
+
+
+def legacy_normalize(value: str) -> str | None:
+    digits = re.sub(r"[^0-9Xx]", "", value)
+    return digits if len(digits) in (10, 13) else None
+
+
+def make_inputs(n: int, rng: random.Random) -> list[str]:
+    values = []
+    for _ in range(n):
+        body = "9784" + "".join(rng.choice("0123456789") for _ in range(8))
+        isbn13 = body + isbn13_check_digit(body)
+        kind = rng.random()
+        if kind < 0.4:
+            values.append(isbn13)
+        elif kind < 0.7:
+            values.append(f"{isbn13[:3]}-{isbn13[3]}-{isbn13[4:8]}-{isbn13[8:12]}-{isbn13[12]}")
+        elif kind < 0.9:
+            isbn10 = isbn13[3:12]
+            total = sum((10 - i) * int(c) for i, c in enumerate(isbn10))
+            check = (11 - total % 11) % 11
+            values.append(f"{isbn10[0]}-{isbn10[1:5]}-{isbn10[5:9]}-{'X' if check == 10 else check}")
+        else:
+            values.append(isbn13[:-1] + str((int(isbn13[-1]) + 1) % 10))
+    return values
+
+
+def main() -> None:
+    values = make_inputs(10_000, random.Random(7))
+    assert all(normalize_isbn(v) is None or len(normalize_isbn(v)) == 13 for v in values[:100])
+    assert isbn10_to_13("4130420658") == "9784130420655"
+    for label, fn in (
+        ("legacy regex strip", lambda: [legacy_normalize(v) for v in values]),
+        ("normalize_isbn", lambda: [normalize_isbn(v) for v in values]),
+        ("normalize_isbns (batch)", lambda: normalize_isbns(values)),
+    ):
+        best = min(timeit.repeat(fn, number=5, repeat=3)) / 5
+        print(f"{label:<26} {best / len(values) * 1e9:8.0f} ns/isbn")
+
+
+if __name__ == "__main__":
+    main()
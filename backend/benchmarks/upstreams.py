@@ -0,0 +1,148 @@
+# Offline stand-ins for NDL, CiNii and Calil, served through httpx.MockTransport.
+
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+from dataclasses import dataclass, field
+from xml.sax.saxutils import escape
+
+import httpx
+
+from app.ext import http
+from app.isbn import isbn13_check_digit
+
+CITY = "宮崎市"
+PREF = "宮崎県"
+BRANCH_STATES = ("貸出可", "蔵書あり", "貸出中", "館内のみ")
+
+
+def fake_isbn(seed: str) -> str:
+    body = "978" + str(int(hashlib.sha1(seed.encode()).hexdigest(), 16))[:9]
+    return body + isbn13_check_digit(body)
+
+
+def opensearch_rss(query: str, count: int) -> bytes:
+    items = []
+    for i in range(count):
+        isbn = fake_isbn(f"{query}:{i}")
+        items.append(
+            "<item>"
+            f"<title>{escape(query)} 入門 {i}</title>"
+            f"<dc:creator>著者{i % 37}</dc:creator>"
+            f"<dc:publisher>出版社{i % 11}</dc:publisher>"
+            f'<dc:identifier xsi:type="dcndl:ISBN">{isbn}</dc:identifier>'
+            f'<dc:subject xsi:type="dcndl:NDC10">{(i * 7) % 1000:03d}</dc:subject>'
+            f"<dcterms:issued>{1990 + i % 35}</dcterms:issued>"
+            "</item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+        'xmlns:dcterms="http://purl.org/dc/terms/" xmlns:dcndl="http://ndl.go.jp/dcndl/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        f"<channel><title>{escape(query)}</title>{''.join(items)}</channel></rss>"
+    ).encode()
+
+
+@dataclass
+class UpstreamConfig:
+    search_delay: float = 0.15
+    calil_delay: float = 0.05
+    calil_rounds: int = 1
+    systems: int = 3
+    calls: dict = field(default_factory=lambda: {"ndl": 0, "cinii": 0, "calil": 0})
+
+
+def opensearch_handler(name: str, config: UpstreamConfig, query_param: str, count_param: str):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        config.calls[name] += 1
+        await asyncio.sleep(config.search_delay)
+        params = request.url.params
+        return httpx.Response(200, content=opensearch_rss(params.get(query_param, ""), int(params.get(count_param, 20))))
+
+    return handler
+
+
+def calil_handler(config: UpstreamConfig):
+    # Follows the /check protocol: the first call opens a session and returns
+    # continue=1 with every system still "Running"; each poll advances one
+    # round until calil_rounds have passed and the final books are returned.
+    sessions: dict = {}
+    counter = itertools.count()
+    systemids = [f"Bench_{i}" for i in range(config.systems)]
+
+    def books(isbns, ids, final):
+        rng = random.Random(",".join(isbns))
+        result = {}
+        for isbn in isbns:
+            result[isbn] = {}
+            for systemid in ids:
+                if not final:
+                    result[isbn][systemid] = {"status": "Running", "reserveurl": "", "libkey": {}}
+                    continue
+                libkey = {f"分館{b}": rng.choice(BRANCH_STATES) for b in range(rng.randint(0, 3))}
+                result[isbn][systemid] = {
+                    "status": "OK",
+                    "reserveurl": f"https://opac.bench.example/{systemid}/{isbn}" if libkey else "",
+                    "libkey": libkey,
+                }
+        return result
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        config.calls["calil"] += 1
+        await asyncio.sleep(config.calil_delay)
+        params = request.url.params
+        if request.url.path == "/library":
+            return httpx.Response(
+                200,
+                json=[
+                    {
+                        "systemid": systemid,
+                        "systemname": f"ベンチ図書館{i}",
+                        "pref": PREF,
+                        "city": CITY,
+                        "url_pc": f"https://lib.bench.example/{systemid}",
+                    }
+                    for i, systemid in enumerate(systemids)
+                ],
+            )
+        if "session" in params:
+            state = sessions[params["session"]]
+            state["rounds"] -= 1
+        else:
+            session = f"s{next(counter)}"
+            state = sessions[session] = {
+                "session": session,
+                "isbns": params["isbn"].split(","),
+                "systemids": params["systemid"].split(","),
+                "rounds": config.calil_rounds,
+            }
+        final = state["rounds"] <= 0
+        if final:
+            sessions.pop(state["session"], None)
+        body = json.dumps(
+            {
+                "session": state["session"],
+                "continue": 0 if final else 1,
+                "books": books(state["isbns"], state["systemids"], final),
+            },
+            ensure_ascii=False,
+        )
+        # Calil wraps /check in JSONP unless callback=no is passed.
+        if params.get("callback") != "no":
+            body = f"callback({body});"
+        return httpx.Response(200, content=body.encode())
+
+    return handler
+
+
+def install(config: UpstreamConfig) -> None:
+    handlers = {
+        "ndl": opensearch_handler("ndl", config, "q", "cnt"),
+        "cinii": opensearch_handler("cinii", config, "title", "count"),
+        "calil": calil_handler(config),
+    }
+    for name, handler in handlers.items():
+        http._clients[name] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
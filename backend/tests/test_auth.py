@@ -0,0 +1,20 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app import deps
+from app.models import User
+
+
+@pytest.mark.asyncio
+async def test_claims_mode_skips_database(monkeypatch):
+    monkeypatch.setattr(deps.settings, "auth_mode", "claims")
+    user = User(id=uuid4(), email="reader@example.com", created_at=datetime(2024, 4, 1))
+    token = deps.create_access_token(deps.user_claims(user))
+
+    current = await deps.get_current_user(token)
+
+    assert current.id == user.id
+    assert current.email == user.email
+    assert current.created_at == user.created_at
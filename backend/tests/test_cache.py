@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app.cache import LRU, SearchCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  統計学　入門 ") == "統計学 入門"
+    assert normalize_query("ＰＹＴＨＯＮ") == "python"
+
+
+def test_lru_evicts_oldest():
+    lru = LRU(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    cache = SearchCache("test", ttl=0, stale_ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert await cache.get_or_fetch("k", fetch) == 1
+    assert await cache.get_or_fetch("k", fetch) == 1
+    await asyncio.sleep(0)
+    assert len(calls) == 2
+    assert cache.stats.misses == 1
+    assert cache.stats.stale_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_served_when_fetch_fails():
+    cache = SearchCache("test-fallback", ttl=0, stale_ttl=0)
+
+    async def fetch():
+        return ["book"]
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    await cache.get_or_fetch("k", fetch)
+    assert await cache.get_or_fetch("k", failing) == ["book"]
+    assert cache.stats.fallbacks == 1
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from redis import exceptions as redis_exceptions
+
+from app.ext import calil
+from app.ext.calil import Availability, _settled_rows
+from app.ext.resilience import CircuitOpenError
+
+PAYLOAD = {
+    "session": "s",
+    "continue": 1,
+    "books": {
+        "9784000000000": {
+            "Miyazaki_Miyazaki": {
+                "status": "OK",
+                "reserveurl": "https://opac.example/book/1",
+                "libkey": {"中央": "貸出中", "北": "貸出可"},
+            },
+            "Miyazaki_Pref": {"status": "Running", "reserveurl": "", "libkey": {}},
+        }
+    },
+}
+
+
+def test_settled_rows_parse_calil_payload():
+    pending = {("9784000000000", "Miyazaki_Miyazaki"), ("9784000000000", "Miyazaki_Pref")}
+    rows = _settled_rows(PAYLOAD, ["9784000000000"], ["Miyazaki_Miyazaki", "Miyazaki_Pref"], pending, final=False)
+    assert len(rows) == 1
+    row = rows[0]
+    assert row.status == "貸出可"
+    assert json.loads(row.to_json()) == {
+        "isbn13": "9784000000000",
+        "systemid": "Miyazaki_Miyazaki",
+        "status": "貸出可",
+        "calilStatus": "OK",
+        "libkey": {"中央": "貸出中", "北": "貸出可"},
+        "branchUrls": {},
+        "reserveUrl": "https://opac.example/book/1",
+        "opacUrl": "https://opac.example/book/1",
+    }
+    assert pending == {("9784000000000", "Miyazaki_Pref")}
+
+
+def test_availability_cache_round_trip():
+    row = Availability("9784000000000", "Sys", "Cache", None, ())
+    restored = Availability.from_cache("9784000000000", "Sys", row.to_cache())
+    assert restored.status == "蔵書なし"
+    assert restored.to_json() == row.to_json()
+    assert not Availability("9784000000000", "Sys", "Error", None, ()).cacheable
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_returns_cached_rows_and_marks_the_rest(monkeypatch):
+    cached = Availability("9784000000000", "Miyazaki_Miyazaki", "OK", None, (("中央", "貸出可"),))
+
+    async def cached_rows(isbns, systemids):
+        return {("9784000000000", "Miyazaki_Miyazaki"): cached}
+
+    async def poll(isbns, systemids, key):
+        raise CircuitOpenError("calil circuit is open")
+
+    monkeypatch.setattr(calil, "_cached_rows", cached_rows)
+    monkeypatch.setattr(calil, "_poll_batch", poll)
+    monkeypatch.setattr(calil, "redis", None)
+    systemids = ["Miyazaki_Miyazaki", "Miyazaki_Pref"]
+    rows = [row async for chunk in calil._iter_rows(["9784000000000"], systemids) for row in chunk]
+    assert [(row.systemid, row.status) for row in rows] == [
+        ("Miyazaki_Miyazaki", "貸出可"),
+        ("Miyazaki_Pref", "照会失敗"),
+    ]
+    assert not rows[1].cacheable
+
+
+def calil_response(request, payload):
+    # Like Calil, answer JSONP unless the client asked for callback=no.
+    body = json.dumps(payload)
+    if request.url.params.get("callback") != "no":
+        body = f"callback({body});"
+    return httpx.Response(200, text=body)
+
+
+def _row(isbn, systemid, state="貸出可"):
+    return Availability(isbn, systemid, "OK", None, (("中央", state),))
+
+
+def test_missing_batches_only_ask_for_uncached_pairs(monkeypatch):
+    monkeypatch.setattr(calil.settings, "calil_max_isbns", 2)
+    systemids = ["A", "B"]
+    cached = {pair: _row(*pair) for pair in [("111", "A"), ("222", "A"), ("333", "A"), ("333", "B")]}
+    batches = calil._missing_batches(["111", "222", "333", "444", "555", "666"], systemids, cached)
+    assert batches == [
+        (["111", "222"], ["B"]),
+        (["444", "555"], ["A", "B"]),
+        (["666"], ["A", "B"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_check_availability_merges_cached_and_fresh_rows_in_order(monkeypatch):
+    polled = []
+
+    async def cached_rows(isbns, systemids):
+        return {("111", "B"): _row("111", "B", "蔵書あり")}
+
+    async def poll(isbns, systemids, key):
+        polled.append((isbns, systemids))
+        return [_row(isbn, systemid) for isbn in isbns for systemid in systemids]
+
+    async def systemids_for_city(city):
+        return ["A", "B"]
+
+    monkeypatch.setattr(calil, "_cached_rows", cached_rows)
+    monkeypatch.setattr(calil, "_poll_batch", poll)
+    monkeypatch.setattr(calil, "get_systemids_for_city", systemids_for_city)
+    monkeypatch.setattr(calil, "redis", None)
+    rows = await calil.check_availability(["222", "111", "222"], "宮崎市")
+    assert sorted(polled) == [(["111"], ["A"]), (["222"], ["A", "B"])]
+    assert [(row.systemid, row.isbn13, row.status) for row in rows] == [
+        ("A", "222", "貸出可"),
+        ("A", "111", "貸出可"),
+        ("B", "222", "貸出可"),
+        ("B", "111", "蔵書あり"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_all_receive_partial_rows(monkeypatch):
+    release = asyncio.Event()
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.params["isbn"])
+        await release.wait()
+        state = PAYLOAD["books"]["9784000000000"]["Miyazaki_Miyazaki"]
+        return calil_response(request, {"continue": 0, "books": {"111": {"A": state}}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(calil, "get_client", lambda name: client)
+    monkeypatch.setattr(calil, "redis", None)
+    first, second = asyncio.Queue(), asyncio.Queue()
+    tasks = [asyncio.create_task(calil._check_batch(["111"], ["A"], queue)) for queue in (first, second)]
+    while not calls:
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert calls == ["111"]
+    for queue in (first, second):
+        kinds = [queue.get_nowait()[0] for _ in range(queue.qsize())]
+        assert kinds == ["rows", "done"]
+    assert not calil._listeners
+
+
+class DownRedis:
+    async def mget(self, keys):
+        raise redis_exceptions.ConnectionError("down")
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, *args, **kwargs):
+        return self
+
+    async def execute(self):
+        raise redis_exceptions.ConnectionError("down")
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_is_a_cache_miss(monkeypatch):
+    monkeypatch.setattr(calil, "redis", DownRedis())
+    assert await calil._cached_rows(["111"], ["A"]) == {}
+    await calil._store_rows([_row("111", "A")])
@@ -0,0 +1,57 @@
+import pytest
+
+from app.ext import calil_libraries
+from app.ext.calil_libraries import AmbiguousPlaceError, LibraryIndex
+from app.ext.resilience import UpstreamUnavailable
+
+ROWS = [
+    ["Miyazaki_Miyazaki", "宮崎県宮崎市", "宮崎県", "宮崎市", "https://lib.example/miyazaki"],
+    ["Miyazaki_Pref", "宮崎県立図書館", "宮崎県", "宮崎市", "https://lib.example/pref"],
+    ["Miyazaki_Miyazaki", "宮崎県宮崎市", "宮崎県", "宮崎市", "https://lib.example/miyazaki-branch"],
+    ["Miyazaki_Nobeoka", "宮崎県延岡市", "宮崎県", "延岡市", "https://lib.example/nobeoka"],
+    ["Tokyo_Fuchu", "東京都府中市", "東京都", "府中市", ""],
+    ["Hiroshima_Fuchu", "広島県府中市", "広島県", "府中市", ""],
+]
+
+
+def test_library_index_resolves_cities_and_prefectures():
+    index = LibraryIndex(ROWS, fetched_at=0)
+    assert index.systemids("宮崎市") == ["Miyazaki_Miyazaki", "Miyazaki_Pref"]
+    assert index.systemids("宮崎県 延岡市") == ["Miyazaki_Nobeoka"]
+    assert len(index.systemids("宮崎県")) == 3
+    assert index.systemids("札幌市") == []
+    assert index.system("Miyazaki_Miyazaki").url == "https://lib.example/miyazaki"
+
+
+def test_same_named_cities_need_their_prefecture():
+    index = LibraryIndex(ROWS, fetched_at=0)
+    assert index.systemids("東京都府中市") == ["Tokyo_Fuchu"]
+    assert index.systemids("広島県 府中市") == ["Hiroshima_Fuchu"]
+    with pytest.raises(AmbiguousPlaceError) as exc:
+        index.systemids("府中市")
+    assert exc.value.prefectures == ["広島県", "東京都"]
+
+
+async def test_failed_prefectures_keep_previous_rows(monkeypatch):
+    async def fetch(pref):
+        if pref == "東京都":
+            raise UpstreamUnavailable("calil")
+        return [[f"{pref}_new", pref, pref, "", ""]]
+
+    monkeypatch.setattr(calil_libraries, "_fetch_prefecture", fetch)
+    monkeypatch.setattr(calil_libraries, "redis", None)
+    monkeypatch.setattr(calil_libraries.settings, "calil_prefectures", "宮崎県,東京都")
+    snapshot = await calil_libraries._fetch_snapshot({"fetched": 1, "rows": ROWS})
+    assert snapshot["failed"] == ["東京都"]
+    assert [row[0] for row in snapshot["rows"]] == ["宮崎県_new", "Tokyo_Fuchu"]
+    assert not calil_libraries._snapshot_is_fresh({**snapshot, "fetched": snapshot["fetched"] - 3600})
+
+    monkeypatch.setattr(calil_libraries.settings, "calil_prefectures", "東京都")
+    with pytest.raises(RuntimeError):
+        await calil_libraries._fetch_snapshot(None)
+
+
+def test_bundled_snapshot_serves_before_first_fetch():
+    index = calil_libraries._load_bundled()
+    assert index is not None and index.fetched_at == 0
+    assert index.systemids("宮崎市") == ["Miyazaki_Miyazaki", "Miyazaki_Pref"]
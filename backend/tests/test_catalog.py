@@ -0,0 +1,49 @@
+import pytest
+
+from app.models import Book
+from app.services.catalog import search_local_catalog, store_catalog_books
+
+
+@pytest.mark.asyncio
+async def test_local_catalog_search_uses_trigram_word_similarity(recording_session):
+    book = Book(isbn13="9784130420655", title="統計学入門", author="東京大学教養学部統計学教室")
+    session = recording_session(rows=[book])
+    (found,) = await search_local_catalog(session, "  統計学　入門 ", limit=5)
+    assert found["isbn13"] == "9784130420655"
+    assert found["title"] == "統計学入門"
+    (stmt,) = session.statements
+    title_match, author_match = stmt.whereclause.clauses
+    assert [match.left.key for match in (title_match, author_match)] == ["title", "author"]
+    assert {match.operator.opstring for match in (title_match, author_match)} == {"%>"}
+    assert title_match.right.value == "統計学 入門"
+    (order,) = stmt._order_by_clauses
+    assert order.element.name == "greatest"
+    assert stmt._limit == 5
+
+
+@pytest.mark.asyncio
+async def test_store_catalog_books_upserts_sorted_unique_rows(recording_session):
+    session = recording_session()
+    await store_catalog_books(
+        session,
+        [
+            {"isbn13": "9784532130039", "title": "はじめての統計学", "author": "鳥居泰彦"},
+            {"isbn13": "9784130420655", "title": "統計学入門"},
+            {"isbn13": "9784130420655", "title": "重複"},
+            {"isbn13": "9784000000000", "title": None},
+        ],
+    )
+    (stmt,) = session.statements
+    assert stmt.is_insert
+    rows = [{column.key: value for column, value in row.items()} for row in stmt._multi_values[0]]
+    assert [(row["isbn13"], row["title"]) for row in rows] == [
+        ("9784130420655", "統計学入門"),
+        ("9784532130039", "はじめての統計学"),
+    ]
+    assert all(row["embedding_model"] and len(row["embedding"]) for row in rows)
+    conflict = stmt._post_values_clause
+    assert [column.key for column in conflict.inferred_target_elements] == ["isbn13"]
+    assert conflict.update_values_to_set["title"].name == "coalesce"
+    assert conflict.update_values_to_set["embedding"].table.name == "excluded"
+    assert conflict.update_values_to_set["embedding_model"].table.name == "excluded"
+    assert session.committed
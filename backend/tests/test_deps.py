@@ -0,0 +1,35 @@
+from datetime import datetime
+from uuid import uuid4
+
+import redis.asyncio as aioredis
+
+from app import deps
+from app.deps import ReadSessionLocal, engine, read_engine, settings
+from app.models import User
+
+
+def test_engine_uses_pool_settings():
+    assert engine.pool.size() == settings.db_pool_size
+    assert engine.pool._max_overflow == settings.db_max_overflow
+
+
+def test_reads_use_primary_without_replica():
+    assert settings.database_read_url is None
+    assert read_engine is engine
+    assert ReadSessionLocal.kw["bind"] is engine
+
+
+class DownRedis:
+    async def get(self, *args, **kwargs):
+        raise aioredis.ConnectionError("down")
+
+    set = delete = get
+
+
+async def test_user_cache_survives_redis_outage(monkeypatch):
+    monkeypatch.setattr(deps, "redis", DownRedis())
+    user = User(id=uuid4(), email="reader@example.com", created_at=datetime(2024, 1, 1))
+    await deps._remember_user(user)
+    assert (await deps._cached_user(str(user.id))).email == "reader@example.com"
+    await deps.invalidate_user(user.id)
+    assert await deps._cached_user(str(user.id)) is None
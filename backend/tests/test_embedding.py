@@ -0,0 +1,26 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from app.services import embedding
+from app.services.embedding import EMBEDDING_DIM, HashingEmbedder
+
+
+def test_hashing_embedder_is_normalized_and_semantic():
+    vectors = HashingEmbedder().embed(["統計学入門", "はじめての統計学", "日本の城郭建築", ""])
+    assert vectors.shape == (4, EMBEDDING_DIM)
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_configured_model_without_sentence_transformers_fails(monkeypatch):
+    monkeypatch.setattr(embedding.settings, "embedding_model", "intfloat/multilingual-e5-base")
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    embedding.get_embedder.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="sentence-transformers"):
+            embedding.get_embedder()
+    finally:
+        embedding.get_embedder.cache_clear()
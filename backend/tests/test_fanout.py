@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.services.fanout import Source, fan_out
+
+
+async def _slow():
+    await asyncio.sleep(1)
+    return [{"isbn13": "9784000000000"}]
+
+
+async def _fast():
+    return [{"isbn13": "9784000000001"}]
+
+
+async def _broken():
+    raise RuntimeError("upstream down")
+
+
+@pytest.mark.asyncio
+async def test_fan_out_returns_partial_results():
+    outcome = await fan_out([Source("slow", _slow, 0.05), Source("fast", _fast, 1.0), Source("broken", _broken, 1.0)])
+    assert outcome.contributed == ["fast"]
+    assert outcome.failed == {"slow": "timeout", "broken": "RuntimeError"}
@@ -0,0 +1,121 @@
+import uuid
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import Book, Goal, GoalBook
+from app.schemas import GoalCreate
+from app.services.goals import (
+    adjust_goal_progress,
+    attach_books_to_goal,
+    get_or_create_books,
+    reconcile_goal_progress,
+)
+
+
+def progress_deltas(stmt):
+    return {column.key: value.right.value for column, value in stmt._values.items()}
+
+
+@pytest.mark.asyncio
+async def test_adjust_goal_progress_increments_in_place(recording_session):
+    session = recording_session(row=(4, 2))
+    assert await adjust_goal_progress(session, uuid.uuid4(), total_delta=1, done_delta=1) == (4, 2)
+    (stmt,) = session.statements
+    assert stmt.is_update and stmt.table.name == "goals"
+    assert progress_deltas(stmt) == {"total_books": 1, "done_books": 1}
+    assert [column.key for column in stmt._returning] == ["total_books", "done_books"]
+
+
+@pytest.mark.asyncio
+async def test_adjust_goal_progress_skips_update_without_change(recording_session):
+    session = recording_session(row=(3, 1))
+    assert await adjust_goal_progress(session, uuid.uuid4()) == (3, 1)
+    (stmt,) = session.statements
+    assert stmt.is_select
+    assert [column.key for column in stmt.selected_columns] == ["total_books", "done_books"]
+
+
+@pytest.mark.asyncio
+async def test_attach_books_counts_only_new_books(recording_session):
+    goal = Goal(id=uuid.uuid4(), title="統計")
+    kept = Book(id=uuid.uuid4(), isbn13="9784130420655", title="統計学入門")
+    added = Book(id=uuid.uuid4(), isbn13="9784532130039", title="はじめての統計学")
+    goal.goal_books.append(GoalBook(goal_id=goal.id, book_id=kept.id, position=1, status="done"))
+    session = recording_session(row=(2, 1))
+    assert await attach_books_to_goal(session, goal, [added, kept]) == (2, 1)
+    assert [(gb.book_id, gb.position) for gb in goal.goal_books] == [(kept.id, 2), (added.id, 1)]
+    (stmt,) = session.statements
+    assert progress_deltas(stmt) == {"total_books": 1, "done_books": 0}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_locks_drifted_goals_before_recounting(recording_session):
+    session = recording_session(rows=[])
+    assert await reconcile_goal_progress(session) == []
+    (stmt,) = session.statements
+    assert stmt.is_select
+    assert stmt._for_update_arg.of == [Goal.__table__]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_recounts_only_locked_goals(recording_session):
+    goal_id = uuid.uuid4()
+    session = recording_session(rows=[goal_id])
+    assert await reconcile_goal_progress(session) == [goal_id]
+    lock, recount = session.statements
+    assert lock._for_update_arg is not None
+    assert recount.is_update and recount.table.name == "goals"
+    assert [goal_id] in recount.compile().params.values()
+    assert {column.key for column in recount._values} == {"total_books", "done_books"}
+
+
+def test_goal_create_normalizes_and_rejects_invalid_isbns():
+    goal = GoalCreate(title="統計", recommended_isbns=["4-13-042065-8", "9784130420655", "978-4-532-13003-9"])
+    assert goal.recommended_isbns == ["9784130420655", "9784532130039"]
+    with pytest.raises(ValidationError, match="invalid ISBN: 9784130420656, abc"):
+        GoalCreate(title="統計", recommended_isbns=["9784130420655", "9784130420656", "abc"])
+
+
+class BookSession:
+    # In-memory books table. ISBNs in `concurrent` are inserted by "another
+    # request" right after the first SELECT, so our INSERT conflicts on them.
+    def __init__(self, existing=(), concurrent=()):
+        self.rows = {}
+        for isbn in existing:
+            self._add(isbn)
+        self.concurrent = list(concurrent)
+        self.kinds = []
+
+    def _add(self, isbn):
+        self.rows[isbn] = Book(id=uuid.uuid4(), isbn13=isbn, title=f"書籍 {isbn}")
+        return self.rows[isbn]
+
+    async def scalars(self, stmt, params=None):
+        if stmt.is_insert:
+            self.kinds.append("insert")
+            return iter([self._add(row["isbn13"]) for row in params if row["isbn13"] not in self.rows])
+        self.kinds.append("select")
+        isbns = stmt.compile().params["isbns"]
+        found = [self.rows[isbn] for isbn in isbns if isbn in self.rows]
+        while self.concurrent:
+            self._add(self.concurrent.pop())
+        return iter(found)
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_books_keeps_order_and_collapses_duplicates():
+    session = BookSession(existing=["9784532130039"])
+    books = await get_or_create_books(session, ["4-13-042065-8", "9784532130039", "9784130420655", "bad"])
+    assert [book.isbn13 for book in books] == ["9784130420655", "9784532130039"]
+    assert books[1] is session.rows["9784532130039"]
+    assert session.kinds == ["select", "insert"]
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_books_returns_rows_inserted_concurrently():
+    session = BookSession(concurrent=["9784130420655"])
+    books = await get_or_create_books(session, ["9784532130039", "9784130420655"])
+    assert [book.isbn13 for book in books] == ["9784532130039", "9784130420655"]
+    assert books[1] is session.rows["9784130420655"]
+    assert session.kinds == ["select", "insert", "select"]
@@ -15,3 +15,22 @@ async def test_health_endpoint():
         resp = await client.get("/health")
     assert resp.status_code == 200
     assert resp.json()["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_latency():
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/health")
+        resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in resp.text
+    assert "upstream_circuit_open" in resp.text
+
+
+def test_multiprocess_metrics_include_stats(monkeypatch, tmp_path):
+    from app.metrics import render_metrics
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body, _ = render_metrics()
+    assert b"upstream_circuit_open" in body
+    assert b"search_cache_lookups" in body
@@ -0,0 +1,32 @@
+from app.isbn import find_isbn, isbn13_to_10, normalize_isbn, normalize_isbns
+
+
+def test_normalize_isbn_converts_and_validates():
+    assert normalize_isbn("4-13-042065-8") == "9784130420655"
+    assert normalize_isbn("978-4-13-042065-5") == "9784130420655"
+    assert normalize_isbn("９７８４１３０４２０６５５") == "9784130420655"
+    assert normalize_isbn("978-4-13-042065-4") is None
+    assert normalize_isbn("4130420659") is None
+    assert normalize_isbn("") is None
+
+
+def test_isbn10_with_x_check_digit():
+    assert normalize_isbn("0-8044-2957-X") == "9780804429573"
+    assert isbn13_to_10("9780804429573") == "080442957X"
+
+
+def test_normalize_isbns_dedupes_across_formats():
+    assert normalize_isbns(["4130420658", "9784130420655", "bogus", "978-4-13-042065-5"]) == ["9784130420655"]
+
+
+def test_find_isbn_in_text():
+    assert find_isbn("東京大学出版会, 1991. ISBN: 4-13-042065-8") == "9784130420655"
+    assert find_isbn("NCID BN01234567") is None
+
+
+def test_batch_path_matches_single_normalizer():
+    values = ["4-13-042065-8", "0-8044-2957-X", "080442957x", "978-4-13-042065-4", "９７８４１３０４２０６５５", "abc", ""]
+    values += [f"978413042{n:03d}" + "0123456789"[n % 10] for n in range(60)]
+    expected = list(dict.fromkeys(isbn for isbn in map(normalize_isbn, values) if isbn))
+    assert len(values) >= 40
+    assert normalize_isbns(values) == expected
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app.deps import get_current_user, get_db, get_read_db
+from app.main import app
+from app.models import Book, Goal, GoalBook, User
+
+USER = User(id=uuid4(), email="reader@example.com", created_at=datetime(2024, 4, 1))
+
+
+class GoalsSession:
+    def __init__(self, goals):
+        self.goals = goals
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return self
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.goals
+
+    def scalar_one_or_none(self):
+        return self.goals[0] if self.goals else None
+
+
+def _goal(created_at, **kwargs):
+    return Goal(
+        id=uuid4(), user_id=USER.id, title="統計", created_at=created_at, updated_at=created_at,
+        archived=False, total_books=0, done_books=0, **kwargs,
+    )
+
+
+@pytest.fixture
+def client_for(monkeypatch):
+    def make(session):
+        async def override():
+            yield session
+
+        for dep in (get_db, get_read_db):
+            app.dependency_overrides[dep] = override
+        app.dependency_overrides[get_current_user] = lambda: USER
+        return AsyncClient(app=app, base_url="http://test")
+
+    yield make
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.asyncio
+async def test_mypage_cursor_round_trips_as_timestamptz(client_for):
+    start = datetime(2024, 4, 1, 9, 30, tzinfo=timezone.utc)
+    session = GoalsSession([_goal(start - timedelta(minutes=i)) for i in range(3)])
+    async with client_for(session) as client:
+        first = (await client.get("/mypage/goals", params={"limit": 2})).json()
+        resp = await client.get("/mypage/goals", params={"limit": 2, "cursor": first["next_cursor"]})
+    assert resp.status_code == 200
+    compiled = session.statements[1].compile(dialect=asyncpg.dialect())
+    assert "(goals.created_at, goals.id) < ($2::TIMESTAMP WITH TIME ZONE, $3::UUID)" in str(compiled)
+    assert compiled.params["param_1"] == start - timedelta(minutes=1)
+    assert compiled.params["param_1"].tzinfo is not None
+
+
+@pytest.mark.asyncio
+async def test_goal_detail_renders_books_in_position_order(client_for):
+    goal = _goal(datetime(2024, 4, 1, tzinfo=timezone.utc), goal_books=[])
+    for position, (isbn, status) in enumerate([("9784532130039", "unread"), ("9784130420655", "done")], start=1):
+        book = Book(id=uuid4(), isbn13=isbn, title=f"本 {position}")
+        goal.goal_books.append(GoalBook(book=book, book_id=book.id, position=3 - position, status=status))
+    session = GoalsSession([goal])
+    async with client_for(session) as client:
+        resp = await client.get(f"/goals/{goal.id}")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [(item["book"]["isbn13"], item["status"]) for item in body["books"]] == [
+        ("9784130420655", "done"),
+        ("9784532130039", "unread"),
+    ]
+    (stmt,) = session.statements
+    (loads,) = stmt._with_options
+    assert [dict(load.strategy)["lazy"] for load in loads.context] == ["selectin", "joined"]
@@ -0,0 +1,30 @@
+import pytest
+
+from app.ext import opac_link
+from app.ext.opac_link import SystemLinks, Template, build_links
+
+
+def test_template_compiles_fields():
+    template = Template("https://opac.example/search?isbn={isbn10}&q=100%&sys={systemid}")
+    assert template.fields == ("isbn10", "systemid")
+    assert template.render({"isbn10": "4532130031", "systemid": "S"}) == "https://opac.example/search?isbn=4532130031&q=100%&sys=S"
+    with pytest.raises(ValueError):
+        Template("https://opac.example/{title}")
+
+
+def test_build_links_batches_variants(monkeypatch):
+    monkeypatch.setitem(
+        opac_link.REGISTRY,
+        "Sys",
+        SystemLinks(
+            Template("https://opac.example/isbn/{isbn13}"),
+            Template("https://opac.example/{libkey}/{isbn13}"),
+            Template("https://opac.example/reserve/{isbn10}"),
+        ),
+    )
+    links = build_links("Sys", [("9784532130039", None, ["中央"]), ("9784000000000", "https://calil/r", [])])
+    assert links[0].opac_url == "https://opac.example/isbn/9784532130039"
+    assert links[0].reserve_url == "https://opac.example/reserve/4532130034"
+    assert links[0].branch_urls == (("中央", "https://opac.example/%E4%B8%AD%E5%A4%AE/9784532130039"),)
+    assert links[1].reserve_url == "https://calil/r"
+    assert build_links("Unknown", [("9784532130039", None, [])])[0].opac_url is None
@@ -0,0 +1,84 @@
+from xml.etree.ElementTree import ParseError
+
+import pytest
+
+from app.ext.opensearch import parse_opensearch_stream
+
+NDL_RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/"
+     xmlns:dcndl="http://ndl.go.jp/dcndl/terms/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<channel><title>統計学</title>
+<item>
+  <title>統計学入門</title>
+  <author>東京大学教養学部統計学教室 編</author>
+  <dc:publisher>東京大学出版会</dc:publisher>
+  <dcterms:issued xsi:type="dcterms:W3CDTF">1991</dcterms:issued>
+  <dc:identifier xsi:type="dcndl:NDLBibID">000002110937</dc:identifier>
+  <dc:identifier xsi:type="dcndl:ISBN">4-13-042065-8</dc:identifier>
+  <dc:subject xsi:type="dcndl:NDC9">417</dc:subject>
+  <dc:subject xsi:type="dcndl:NDLC">MA121</dc:subject>
+</item>
+<item><title>ISBNなし</title></item>
+<item>
+  <title>統計学入門 第2版</title>
+  <dc:identifier xsi:type="dcndl:ISBN">9784130420655</dc:identifier>
+</item>
+<item>
+  <title>はじめての統計学</title>
+  <dc:identifier xsi:type="dcndl:ISBN">978-4-532-13003-9</dc:identifier>
+</item>
+</channel></rss>""".encode()
+
+CINII_RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rdf:RDF xmlns="http://purl.org/rss/1.0/" xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/">
+<item rdf:about="https://ci.nii.ac.jp/ncid/BN06569116">
+  <title>統計学入門</title>
+  <dc:creator>東京大学教養学部統計学教室編</dc:creator>
+  <dc:publisher>東京大学出版会</dc:publisher>
+  <dc:date>1991-07</dc:date>
+  <dcterms:hasPart rdf:resource="urn:isbn:4130420658"/>
+</item>
+</rdf:RDF>""".encode()
+
+
+async def _chunks(data: bytes, size: int = 64):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+@pytest.mark.asyncio
+async def test_parses_ndl_fields_and_dedupes():
+    items = await parse_opensearch_stream(_chunks(NDL_RSS), limit=10)
+    assert [item["isbn13"] for item in items] == ["9784130420655", "9784532130039"]
+    assert items[0] == {
+        "isbn13": "9784130420655",
+        "title": "統計学入門",
+        "author": "東京大学教養学部統計学教室 編",
+        "publisher": "東京大学出版会",
+        "pubyear": 1991,
+        "ndc": "417",
+        "ndlc": "MA121",
+    }
+
+
+@pytest.mark.asyncio
+async def test_stops_after_limit():
+    items = await parse_opensearch_stream(_chunks(NDL_RSS), limit=1)
+    assert len(items) == 1
+
+
+@pytest.mark.asyncio
+async def test_parses_cinii_rss1():
+    (item,) = await parse_opensearch_stream(_chunks(CINII_RSS), limit=10)
+    assert item["isbn13"] == "9784130420655"
+    assert item["author"] == "東京大学教養学部統計学教室編"
+    assert item["pubyear"] == 1991
+
+
+@pytest.mark.asyncio
+async def test_malformed_feed_raises_instead_of_returning_partial_items():
+    with pytest.raises(ParseError):
+        await parse_opensearch_stream(_chunks(NDL_RSS.replace(b"</item>\n<item><title>", b"</item><<item>")), limit=10)
+    with pytest.raises(ParseError):
+        await parse_opensearch_stream(_chunks(NDL_RSS[:400]), limit=10)
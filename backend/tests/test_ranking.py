@@ -0,0 +1,19 @@
+from app.services.ranking import rank_books
+
+
+def test_rank_books_orders_by_features_and_explains():
+    books = [
+        {"isbn13": "9780000000001", "title": "日本の城", "pubyear": 1990, "ndc": "521", "sources": ["ndl"]},
+        {"isbn13": "9780000000002", "title": "統計学入門", "pubyear": 2022, "ndc": "417", "sources": ["ndl", "cinii"]},
+        {"isbn13": "9780000000003", "title": "はじめての統計学", "pubyear": 2010, "ndc": "417", "sources": ["cinii"]},
+    ]
+
+    ranked = rank_books("統計学 入門", books, {"9780000000003": 5}, limit=2, current_year=2024)
+
+    assert [book["isbn13"] for book in ranked] == ["9780000000002", "9780000000003"]
+    assert "目的のキーワードと書名が一致" in ranked[0]["reason"]
+    assert ranked[0]["score"] > ranked[1]["score"]
+
+
+def test_rank_books_handles_empty_pool():
+    assert rank_books("統計学", [], limit=5) == []
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app import cache
+from app.main import app
+from app.routers import recommend
+from app.services import recommendation_cache
+from app.services.recommendation_cache import recommend_cache
+
+
+class LockRedis:
+    def __init__(self):
+        self.keys = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+
+@pytest.mark.asyncio
+async def test_recommend_answers_304_for_matching_etag(monkeypatch):
+    async def cached(purpose):
+        return {"etag": '"v1"', "items": [{"isbn13": "9784000000000", "title": purpose}]}
+
+    monkeypatch.setattr(recommend, "cached_recommendations", cached)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        resp = await client.get("/recommend", params={"purpose": "統計"})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] == '"v1"'
+        assert resp.json()[0]["title"] == "統計"
+        resp = await client.get("/recommend", params={"purpose": "統計"}, headers={"If-None-Match": '"v1"'})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_refresh_only_touches_expiring_popular_purposes(monkeypatch):
+    monkeypatch.setattr(cache, "redis", None)
+    monkeypatch.setattr(recommendation_cache, "redis", None)
+    monkeypatch.setattr(recommendation_cache, "_purpose_counts", recommendation_cache.Counter())
+    computed = []
+
+    async def compute(purpose):
+        computed.append(purpose)
+        return {"etag": '"new"', "items": []}
+
+    monkeypatch.setattr(recommendation_cache, "_compute", compute)
+    for purpose in ("fresh", "expiring", "expiring"):
+        await recommendation_cache._count_purpose(purpose)
+    recommend_cache.local.set("fresh", (time.time() + 3600, {"etag": '"old"', "items": []}))
+    recommend_cache.local.set("expiring", (time.time() + 1, {"etag": '"old"', "items": []}))
+
+    assert await recommendation_cache.refresh_popular_recommendations() == 1
+    assert computed == ["expiring"]
+    assert recommend_cache.local.get("expiring")[1]["etag"] == '"new"'
+
+
+@pytest.mark.asyncio
+async def test_local_purpose_counts_are_capped(monkeypatch):
+    monkeypatch.setattr(recommendation_cache, "redis", None)
+    monkeypatch.setattr(recommendation_cache, "MAX_TRACKED_PURPOSES", 3)
+    monkeypatch.setattr(recommendation_cache, "_purpose_counts", recommendation_cache.Counter({"popular": 5}))
+    for i in range(10):
+        await recommendation_cache._count_purpose(f"rare {i}")
+    assert len(recommendation_cache._purpose_counts) <= 6
+    assert "popular" in recommendation_cache._purpose_counts
+
+
+@pytest.mark.asyncio
+async def test_one_worker_claims_each_refresh(monkeypatch):
+    monkeypatch.setattr(recommendation_cache, "redis", LockRedis())
+    assert await recommendation_cache._claim_refresh()
+    assert not await recommendation_cache._claim_refresh()
@@ -0,0 +1,96 @@
+import asyncio
+from xml.etree.ElementTree import ParseError
+
+import httpx
+import pytest
+
+from app.ext import resilience
+from app.ext.resilience import CircuitBreaker, CircuitOpenError, RateLimitedError, TokenBucket, breakers, guarded
+
+
+def test_token_bucket_rejects_beyond_max_wait():
+    bucket = TokenBucket("test", rate=1.0, burst=2.0)
+    assert bucket._reserve_local(0) == 0
+    assert bucket._reserve_local(0) == 0
+    assert bucket._reserve_local(0) == -1
+    assert 0 < bucket._reserve_local(5) <= 1
+
+
+def test_breaker_opens_on_failures_and_half_opens(monkeypatch):
+    breaker = CircuitBreaker("test")
+    for _ in range(10):
+        breaker.before_call()
+        breaker.record(False, 0.1)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.opened_at -= 3600
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test")
+    for _ in range(10):
+        breaker.record(True, 60.0)
+    assert breaker.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_guarded_records_http_errors():
+    breaker = breakers["cinii"]
+    with pytest.raises(httpx.ConnectError):
+        async with guarded("cinii"):
+            raise httpx.ConnectError("refused")
+    assert breaker.snapshot()["failures"] == 1
+
+
+def _half_open(breaker):
+    breaker._open(0.0)
+    breaker.opened_at -= 3600
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_call_is_not_recorded(monkeypatch):
+    breaker = CircuitBreaker("ndl")
+    _half_open(breaker)
+    monkeypatch.setitem(breakers, "ndl", breaker)
+
+    async def refuse():
+        raise RateLimitedError("ndl rate limit exceeded")
+
+    monkeypatch.setattr(resilience.limiters["ndl"], "acquire", refuse)
+    with pytest.raises(RateLimitedError):
+        async with guarded("ndl"):
+            pass
+    assert breaker.state == "half_open"
+    assert not breaker._trial_running
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_is_given_back(monkeypatch):
+    breaker = CircuitBreaker("ndl")
+    _half_open(breaker)
+    monkeypatch.setitem(breakers, "ndl", breaker)
+    with pytest.raises(asyncio.CancelledError):
+        async with guarded("ndl"):
+            raise asyncio.CancelledError()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    assert breaker._trial_running
+
+
+@pytest.mark.asyncio
+async def test_parse_error_fails_the_half_open_trial(monkeypatch):
+    breaker = CircuitBreaker("ndl")
+    _half_open(breaker)
+    monkeypatch.setitem(breakers, "ndl", breaker)
+    with pytest.raises(ParseError):
+        async with guarded("ndl"):
+            raise ParseError("no element found")
+    assert breaker.state == "open"
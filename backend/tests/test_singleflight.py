@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from fakeredis import aioredis as fake_aioredis
+
+from app import singleflight
+from app.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(10)))
+    assert results == ["result"] * 10
+    assert len(calls) == 1
+    assert flight.coalesced == 9
+    assert await flight.do("key", upstream) == "result"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_followers_in_other_workers_wait_for_leader(monkeypatch):
+    monkeypatch.setattr(singleflight, "redis", fake_aioredis.FakeRedis())
+    # Separate instances stand in for two workers sharing Redis.
+    leader, follower = SingleFlight("xworker", lock_ttl=5), SingleFlight("xworker", lock_ttl=5)
+    store = {}
+    calls = []
+    started = asyncio.Event()
+
+    async def upstream():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.05)
+        store["key"] = "result"
+        return "result"
+
+    async def lookup():
+        return store.get("key")
+
+    first = asyncio.create_task(leader.do("key", upstream, lookup))
+    await started.wait()
+    assert await asyncio.wait_for(follower.do("key", upstream, lookup), timeout=2) == "result"
+    assert await first == "result"
+    assert len(calls) == 1
+    assert follower.coalesced == 1
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from app.tracing import NOOP, find_trace, span, start_trace, traced
+
+
+@traced("child")
+async def child() -> None:
+    with span("leaf", n=1):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_spans_follow_tasks_into_the_ring_buffer():
+    with start_trace("root", sampled=True) as root:
+        await asyncio.gather(asyncio.create_task(child()), child())
+    trace = find_trace(root.trace.trace_id)
+    names = [s["name"] for s in trace["spans"]]
+    assert names.count("child") == 2 and names.count("leaf") == 2
+    by_id = {s["span_id"]: s for s in trace["spans"]}
+    for leaf in (s for s in trace["spans"] if s["name"] == "leaf"):
+        assert by_id[leaf["parent_id"]]["name"] == "child"
+        assert by_id[by_id[leaf["parent_id"]]["parent_id"]]["name"] == "root"
+
+
+def test_unsampled_spans_are_noops():
+    assert start_trace("root", sampled=False) is NOOP
+    assert span("anything") is NOOP
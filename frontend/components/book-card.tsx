@@ -1,23 +1,30 @@
 "use client";
 
-import { useQuery } from "@tanstack/react-query";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import clsx from "clsx";
-import { AvailabilityRow, fetchAvailability, Recommendation } from "../lib/api";
+import { AvailabilityRow, Recommendation, streamAvailability } from "../lib/api";
 import { useEffect, useMemo, useState } from "react";
 
 const STATUS_PRIORITY: Record<string, number> = {
-  "在架": 1,
-  "貸出中": 2,
-  "予約受付中": 3
+  "貸出可": 1,
+  "蔵書あり": 2,
+  "館内のみ": 3,
+  "貸出中": 4,
+  "予約中": 5,
+  "準備中": 6,
+  "休館中": 7,
+  "蔵書なし": 8
 };
 
+const AVAILABLE = new Set(["貸出可", "蔵書あり", "館内のみ"]);
+
 function AvailabilityBadge({ rows }: { rows: AvailabilityRow[] | undefined }) {
   if (!rows || rows.length === 0) {
     return <span className="text-sm text-slate-500">照会中...</span>;
   }
-  const best = [...rows].sort((a, b) => (STATUS_PRIORITY[a.status] ?? 4) - (STATUS_PRIORITY[b.status] ?? 4))[0];
+  const best = [...rows].sort((a, b) => (STATUS_PRIORITY[a.status] ?? 9) - (STATUS_PRIORITY[b.status] ?? 9))[0];
   return (
-    <span className={clsx("rounded-md px-2 py-1 text-sm", best.status === "在架" ? "bg-emerald-100 text-emerald-800" : "bg-amber-100 text-amber-800")}>{
+    <span className={clsx("rounded-md px-2 py-1 text-sm", AVAILABLE.has(best.status) ? "bg-emerald-100 text-emerald-800" : "bg-amber-100 text-amber-800")}>{
       best.status
     }</span>
   );
@@ -25,9 +32,11 @@ function AvailabilityBadge({ rows }: { rows: AvailabilityRow[] | undefined }) {
 
 export default function BookCard({ recommendation, city }: { recommendation: Recommendation; city: string }) {
   const [isbns] = useState([recommendation.isbn13]);
+  const queryClient = useQueryClient();
+  const queryKey = ["availability", recommendation.isbn13];
   const { data } = useQuery({
-    queryKey: ["availability", recommendation.isbn13],
-    queryFn: () => fetchAvailability(isbns, city),
+    queryKey,
+    queryFn: () => streamAvailability(isbns, city, (rows) => queryClient.setQueryData(queryKey, rows)),
     staleTime: 1000 * 60 * 5
   });
   const opacUrl = data?.find((row) => row.opacUrl)?.opacUrl;
@@ -7,12 +7,17 @@ export type Recommendation = {
   reason?: string | null;
   ndc?: string | null;
   ndlc?: string | null;
+  sources?: string[];
 };
 
 export type AvailabilityRow = {
   isbn13: string;
   systemid: string;
   status: string;
+  calilStatus: string;
+  libkey: Record<string, string>;
+  branchUrls: Record<string, string>;
+  reserveUrl: string | null;
   opacUrl?: string | null;
 };
 
@@ -62,17 +67,63 @@ export async function fetchAvailability(isbns: string[], city: string): Promise<
   return resp.json();
 }
 
-export async function fetchGoals(token: string): Promise<GoalSummary[]> {
-  const resp = await fetch(`${API_BASE}/mypage/goals`, {
-    headers: {
-      Authorization: `Bearer ${token}`
-    }
+export async function streamAvailability(
+  isbns: string[],
+  city: string,
+  onRows: (rows: AvailabilityRow[]) => void
+): Promise<AvailabilityRow[]> {
+  const resp = await fetch(`${API_BASE}/availability/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ isbns, city })
   });
-  if (!resp.ok) {
-    throw new Error("Failed to fetch goals");
+  if (!resp.ok || !resp.body) {
+    throw new Error("Failed to fetch availability");
   }
-  const data = await resp.json();
-  return data.items ?? [];
+  const reader = resp.body.pipeThrough(new TextDecoderStream()).getReader();
+  const rows: AvailabilityRow[] = [];
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += value;
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    const parsed = lines.filter((line) => line.trim()).map((line) => JSON.parse(line));
+    if (parsed.some((item) => item.error)) {
+      throw new Error("Failed to fetch availability");
+    }
+    if (parsed.length) {
+      rows.push(...parsed);
+      onRows([...rows]);
+    }
+  }
+  return rows;
+}
+
+export async function fetchGoals(token: string): Promise<GoalSummary[]> {
+  const goals: GoalSummary[] = [];
+  let cursor: string | null = null;
+  do {
+    const params = new URLSearchParams({ limit: "200" });
+    if (cursor) {
+      params.set("cursor", cursor);
+    }
+    const resp = await fetch(`${API_BASE}/mypage/goals?${params}`, {
+      headers: {
+        Authorization: `Bearer ${token}`
+      }
+    });
+    if (!resp.ok) {
+      throw new Error("Failed to fetch goals");
+    }
+    const data = await resp.json();
+    goals.push(...(data.items ?? []));
+    cursor = data.next_cursor ?? null;
+  } while (cursor);
+  return goals;
 }
 
 export async function fetchGoalDetail(goalId: string, token: string): Promise<GoalDetail> {